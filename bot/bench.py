@@ -0,0 +1,279 @@
+import re
+import sys
+import random
+import timeit
+import tracemalloc
+from time import perf_counter
+from bs4 import BeautifulSoup
+from utils import clean_brand_text, clean_brand_texts, ArticleDocument
+from summarizer import SentenceModel, summarize
+
+def legacy_clean_brand_text(text):
+    if not text:
+        return text
+
+    replacements = [
+        ("WABetaInfo", "WABeta News"),
+        ("wabetainfo", "WABeta News"),
+        ("WaBetaInfo", "WABeta News"),
+        ("WABETAINFO", "WABeta News"),
+        ("WABetaInfo on X", "WABeta News on Telegram"),
+        ("wabetainfo on X", "WABeta News on Telegram"),
+        (" on X,", " on Telegram,"),
+        (" on X.", " on Telegram."),
+        (" on X ", " on Telegram "),
+        ("Twitter", "Telegram"),
+        ("twitter", "Telegram"),
+    ]
+
+    result = text
+    for old, new in replacements:
+        result = result.replace(old, new)
+
+    result = re.sub(r'\bWABetaInfo\b', 'WABeta News', result, flags=re.IGNORECASE)
+    result = re.sub(r'\bon X\b', 'on Telegram', result, flags=re.IGNORECASE)
+
+    return result
+
+BRAND_SAMPLES = [
+    "WABetaInfo on X reported a new feature.",
+    "wabetainfo on X, and WaBetaInfo on X. WABETAINFO on X ",
+    "Follow us on X: news on x and ON X or On X.",
+    "on X at the start, on Xbox, moon X, on X",
+    "Wabetainfo and wABETAinfo and WABetaInfos and preWABetaInfo.",
+    "Share on Twitter or twitter or TWITTER, Twitteron X, on XTwitter.",
+    "WABetaInfoon X WABetaInfo.on X wabetainfo_on X",
+    "Nothing to change here at all.",
+    "",
+]
+
+def random_brand_text(rng, words=200):
+    vocab = [
+        "WABetaInfo", "wabetainfo", "WaBetaInfo", "WABETAINFO", "Wabetainfo", "on", "X", "x", "ON",
+        "Twitter", "twitter", "WhatsApp", "beta", "feature", "Xbox", ",", ".", " ", "\n", "_", "-",
+    ]
+    return "".join(rng.choice(vocab) + rng.choice(["", " ", " ", ",", "."]) for _ in range(words))
+
+def check_brand_equivalence(rounds=5000):
+    rng = random.Random(0)
+    samples = BRAND_SAMPLES + [random_brand_text(rng, rng.randint(1, 60)) for _ in range(rounds)]
+    for sample in samples:
+        expected = legacy_clean_brand_text(sample)
+        actual = clean_brand_text(sample)
+        if expected != actual:
+            raise AssertionError(f"clean_brand_text mismatch for {sample!r}: {expected!r} != {actual!r}")
+    if clean_brand_texts(samples) != [legacy_clean_brand_text(sample) for sample in samples]:
+        raise AssertionError("clean_brand_texts does not match per-item results")
+    return len(samples)
+
+def bench_brand():
+    checked = check_brand_equivalence()
+    print(f"clean_brand_text: {checked} samples match the legacy implementation")
+
+    paragraph = (
+        "WABetaInfo reports that WhatsApp is rolling out a new feature for beta testers on Android. "
+        "Follow WABetaInfo on X and Twitter for more news, or share it on X, with your friends. "
+        "The update is available to some users today and will reach everyone in the coming weeks. "
+    )
+    article = paragraph * 200
+    titles = [f"WABetaInfo: WhatsApp beta {i} for Android, as seen on X." for i in range(500)]
+
+    cases = [
+        ("long article (%d KB)" % (len(article) // 1024), lambda f: f(article), 50),
+        ("500 titles", lambda f: [f(title) for title in titles], 50),
+    ]
+    for name, run, number in cases:
+        legacy = timeit.timeit(lambda: run(legacy_clean_brand_text), number=number) / number
+        current = timeit.timeit(lambda: run(clean_brand_text), number=number) / number
+        print(f"{name:<28} legacy {legacy * 1000:8.3f} ms   compiled {current * 1000:8.3f} ms   "
+              f"x{legacy / current:.1f}")
+    bulk = timeit.timeit(lambda: clean_brand_texts(titles), number=50) / 50
+    legacy = timeit.timeit(lambda: [legacy_clean_brand_text(title) for title in titles], number=50) / 50
+    print(f"{'500 titles (bulk API)':<28} legacy {legacy * 1000:8.3f} ms   compiled {bulk * 1000:8.3f} ms   "
+          f"x{legacy / bulk:.1f}")
+
+def legacy_extract_key_sentences(text, max_sentences=8):
+    if not text:
+        return []
+
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+
+    key_sentences = []
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if len(sentence) < 20:
+            continue
+        if any(skip in sentence.lower() for skip in ['click here', 'subscribe', 'follow us', 'read more', 'advertisement']):
+            continue
+
+        importance = 0
+        important_words = ['new', 'update', 'feature', 'fix', 'bug', 'add', 'remove', 'change', 'improve', 'support', 'enable', 'disable', 'option', 'setting', 'version', 'beta', 'stable', 'release', 'whatsapp', 'android', 'ios', 'now', 'can', 'will', 'allow', 'introduce']
+        for word in important_words:
+            if word in sentence.lower():
+                importance += 1
+
+        if importance > 0 or len(key_sentences) < 3:
+            key_sentences.append((importance, sentence))
+
+    key_sentences.sort(key=lambda x: x[0], reverse=True)
+
+    result = [s[1] for s in key_sentences[:max_sentences]]
+    return result
+
+# The legacy selection expressed over SentenceModel, to check the model splits and scores identically.
+def model_key_sentences(model, max_sentences=8):
+    scores = model.keyword_scores
+    key_sentences = []
+    for i in model.content_indexes:
+        if scores[i] > 0 or len(key_sentences) < 3:
+            key_sentences.append((scores[i], model.sentences[i]))
+    key_sentences.sort(key=lambda x: x[0], reverse=True)
+    return [s[1] for s in key_sentences[:max_sentences]]
+
+def legacy_fit(summary_text, available_chars):
+    sentences = re.split(r'(?<=[.!?])\s+', summary_text.strip())
+    truncated = []
+    current_len = 0
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if current_len + len(sentence) + 1 <= available_chars:
+            truncated.append(sentence)
+            current_len += len(sentence) + 1
+        else:
+            break
+    return ' '.join(truncated)
+
+def random_article(rng, sentences=80):
+    vocab = [
+        "WhatsApp", "newill", "renew", "update", "features", "fixed", "bugs", "address", "can't",
+        "cannot", "know", "studios", "Android", "iOS", "beta", "versions", "users", "chat", "the",
+        "Click", "here", "subscribe", "follow", "us", "read", "more", "advertisement", "İstanbul",
+    ]
+    parts = []
+    for _ in range(sentences):
+        words = [rng.choice(vocab) for _ in range(rng.randint(1, 18))]
+        parts.append(" ".join(words) + rng.choice([".", "!", "?", "", ".\n"]))
+    return rng.choice([" ", "  ", "\n"]).join(parts)
+
+ARTICLE_SENTENCES = [
+    "WhatsApp is rolling out a new feature that lets people pin several messages in a chat.",
+    "The change was found in the latest beta for Android, available on the Google Play Beta Program.",
+    "According to the screenshot shared above, the pinned messages appear at the top of the conversation.",
+    "This makes it easier to find important information in busy group chats without scrolling back.",
+    "Group admins decide who is able to pin messages, and they can remove a pinned message at any time.",
+    "The company is also working on improvements to the chat list so that it loads faster on older phones.",
+    "Some beta testers reported a bug where the app closed unexpectedly when opening large videos.",
+    "A fix for this problem should be shipped with the next release of the app in the coming weeks.",
+    "There is no information yet about when the feature will reach the stable version for everyone.",
+    "Keep in mind that features under development may change before they are released to the public.",
+    "Meanwhile, the desktop app for Windows received a redesigned settings page with clearer sections.",
+    "It is now possible to manage linked devices and privacy options from one place.",
+    "Click here to subscribe and follow us for more news.",
+]
+
+def check_sentence_equivalence(rounds=2000):
+    rng = random.Random(1)
+    for _ in range(rounds):
+        article = random_article(rng, rng.randint(1, 40))
+        budget = rng.randint(0, 800)
+        model = SentenceModel(article)
+        if model_key_sentences(model) != legacy_extract_key_sentences(article):
+            raise AssertionError(f"key_sentences mismatch for {article!r}")
+        if model.fit(budget) != legacy_fit(article, budget):
+            raise AssertionError(f"fit mismatch for {article!r} at {budget}")
+    return rounds
+
+def bench_sentences():
+    checked = check_sentence_equivalence()
+    print(f"sentence model: {checked} fuzzed articles match the legacy scoring and truncation")
+
+    rng = random.Random(3)
+    article = " ".join(rng.choice(ARTICLE_SENTENCES) for _ in range(400))
+    cases = [
+        ("key sentences", lambda: legacy_extract_key_sentences(article), lambda: model_key_sentences(SentenceModel(article))),
+        ("split + score + fit", lambda: (legacy_extract_key_sentences(article), legacy_fit(article, 800)),
+         lambda: (lambda model: (model_key_sentences(model), model.fit(800)))(SentenceModel(article))),
+    ]
+    print(f"article: {len(article) // 1024} KB, {len(SentenceModel(article).sentences)} sentences")
+    for name, legacy_run, current_run in cases:
+        legacy = timeit.timeit(legacy_run, number=20) / 20
+        current = timeit.timeit(current_run, number=20) / 20
+        print(f"{name:<28} legacy {legacy * 1000:8.3f} ms   model {current * 1000:8.3f} ms   "
+              f"x{legacy / current:.1f}")
+    local = timeit.timeit(lambda: summarize(article, 700), number=20) / 20
+    print(f"{'local summarize (700 chars)':<28} {local * 1000:8.3f} ms (uses the same model)")
+
+def article_page(rng, paragraphs=40, comments=300):
+    head = "".join(f'<script>var chunk{i} = "{"x" * 2000}";</script>' for i in range(20))
+    head += '<meta property="og:image" content="https://wabetainfo.com/wp-content/uploads/og.jpg">'
+    nav = "<nav><ul>" + "".join(f'<li><a href="/c/{i}">Category {i}</a></li>' for i in range(60)) + "</ul></nav>"
+    body = ['<img src="https://wabetainfo.com/wp-content/uploads/2024/lead.jpg">']
+    for i in range(paragraphs):
+        body.append(f"<p>{' '.join(rng.choice(ARTICLE_SENTENCES) for _ in range(3))}</p>")
+        if i % 10 == 5:
+            body.append(f"<h2>Section {i}: what changes for users</h2>")
+            body.append("<ul><li>Pinned messages appear at the top</li><li>Admins decide who can pin</li></ul>")
+            body.append(f"<blockquote>{rng.choice(ARTICLE_SENTENCES)}</blockquote>")
+    sidebar = '<aside class="sidebar">' + "".join(
+        f'<div class="widget"><p>{rng.choice(ARTICLE_SENTENCES)}</p></div>' for _ in range(40)
+    ) + "</aside>"
+    thread = '<section class="comments">' + "".join(
+        f'<div class="comment"><span>user{i}</span><p>{rng.choice(ARTICLE_SENTENCES)}</p></div>'
+        for i in range(comments)
+    ) + "</section>"
+    return (f"<html><head>{head}</head><body>{nav}<article><div class=\"entry-content\">"
+            f"{''.join(body)}</div></article>{sidebar}{thread}</body></html>")
+
+class LegacyArticleDocument(ArticleDocument):
+    def __init__(self, url, html):
+        super().__init__(url, None)
+        self.soup = BeautifulSoup(html, 'lxml')
+
+def extract(document_class, url, html):
+    doc = document_class(url, html)
+    return doc.paragraph_text, doc.full_text, doc.lead_image, doc.og_image
+
+def measure(run):
+    # Time and trace separately; tracemalloc roughly doubles the cost of every allocation.
+    started = perf_counter()
+    result = run()
+    elapsed = perf_counter() - started
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def bench_extract():
+    rng = random.Random(5)
+    url = "https://wabetainfo.com/whatsapp-beta-for-android/"
+    pages = [article_page(rng) for _ in range(5)]
+    print(f"page: {len(pages[0]) // 1024} KB with scripts, navigation, sidebar and comments")
+
+    cases = [
+        ("full parse", lambda html: extract(LegacyArticleDocument, url, html)),
+        ("content strainer", lambda html: extract(ArticleDocument, url, html)),
+    ]
+    expected = [extract(LegacyArticleDocument, url, html) for html in pages]
+    for name, run in cases:
+        elapsed = peak = 0
+        for html, want in zip(pages, expected):
+            result, seconds, memory = measure(lambda: run(html))
+            if result != want:
+                raise AssertionError(f"{name}: extracted article differs from the full parse")
+            elapsed += seconds
+            peak = max(peak, memory)
+        print(f"{name:<28} {elapsed / len(pages) * 1000:8.3f} ms/article   peak {peak / 1024:8.0f} KB")
+
+BENCHMARKS = {
+    "brand": bench_brand,
+    "sentences": bench_sentences,
+    "extract": bench_extract,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,119 @@
+import time
+import threading
+from collections import OrderedDict
+
+caches = {}
+
+class TTLCache:
+    def __init__(self, name, maxsize, ttl):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        caches[name] = self
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self.data[key]
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        with self.lock:
+            if generation is None:
+                self.generation += 1
+            elif generation != self.generation:
+                return
+            self.data[key] = (value, time.monotonic() + self.ttl)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self.lock:
+            self.generation += 1
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.data.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+def get_memory_cache_stats():
+    return {name: cache.stats() for name, cache in caches.items()}
+
+VIEW_EVENTS = {
+    "post_saved": ("stats", "categories"),
+    "share": ("stats",),
+    "user_created": ("stats",),
+}
+
+class ViewCache:
+    def __init__(self):
+        self.views = {}
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+        self.invalidations = 0
+
+    async def get(self, key, render):
+        name = key[0] if isinstance(key, tuple) else key
+        with self.lock:
+            view = self.views.get(key)
+            if view is not None:
+                self.hits += 1
+                return view
+            generation = self.generations.get(name, 0)
+        view = await render()
+        with self.lock:
+            self.renders += 1
+            if self.generations.get(name, 0) == generation:
+                self.views[key] = view
+        return view
+
+    def invalidate(self, *names):
+        with self.lock:
+            for name in names:
+                self.generations[name] = self.generations.get(name, 0) + 1
+                for key in [k for k in self.views if (k[0] if isinstance(k, tuple) else k) == name]:
+                    del self.views[key]
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.views),
+                "hits": self.hits,
+                "renders": self.renders,
+                "invalidations": self.invalidations,
+            }
+
+view_cache = ViewCache()
+
+def invalidate_views(event):
+    view_cache.invalidate(*VIEW_EVENTS.get(event, ()))
@@ -0,0 +1,1072 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from cache import TTLCache, invalidate_views
+
+DB_FILE = os.environ.get("DB_FILE", "posts_history.db")
+DB_CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_READ_THREADS = int(os.environ.get("DB_READ_THREADS", "4"))
+WRITE_BEHIND_INTERVAL = float(os.environ.get("WRITE_BEHIND_INTERVAL", "5"))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "10000"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "600"))
+
+MAX_ROWID = 2 ** 63 - 1
+MAX_TIMESTAMP = 253402300799
+
+_conn = None
+_lock = threading.RLock()
+_local = threading.local()
+_read_conns = []
+
+user_cache = TTLCache("users", USER_CACHE_SIZE, USER_CACHE_TTL)
+subscription_cache = TTLCache("subscriptions", USER_CACHE_SIZE, USER_CACHE_TTL)
+profile_cache = TTLCache("profiles", USER_CACHE_SIZE, USER_CACHE_TTL)
+subscribers_cache = TTLCache("subscribers", 64, USER_CACHE_TTL)
+
+def _connect():
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, cached_statements=256, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+def get_db():
+    global _conn
+    if _conn is None:
+        _conn = _connect()
+    return _conn
+
+def _open_reader():
+    conn = _connect()
+    conn.execute("PRAGMA query_only=ON")
+    _local.conn = conn
+    with _lock:
+        _read_conns.append(conn)
+
+@contextmanager
+def _reader_cursor(conn):
+    cur = conn.cursor()
+    try:
+        yield cur
+    finally:
+        cur.close()
+
+@contextmanager
+def db_cursor():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        with _reader_cursor(conn) as cur:
+            yield cur
+        return
+    with _lock:
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+class DbExecutor:
+    def __init__(self, name, workers, initializer=None):
+        self.name = name
+        self.workers = workers
+        self.initializer = initializer
+        self.pool = None
+        self.lock = threading.Lock()
+        self.metrics = {
+            "calls": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "exec_ms_total": 0.0,
+            "exec_ms_max": 0.0,
+        }
+
+    def _pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix=f"db-{self.name}", initializer=self.initializer
+                )
+            return self.pool
+
+    def _record(self, wait, elapsed, failed):
+        with self.lock:
+            m = self.metrics
+            m["calls"] += 1
+            m["in_flight"] -= 1
+            m["errors"] += failed
+            m["wait_ms_total"] += wait * 1000
+            m["wait_ms_max"] = max(m["wait_ms_max"], wait * 1000)
+            m["exec_ms_total"] += elapsed * 1000
+            m["exec_ms_max"] = max(m["exec_ms_max"], elapsed * 1000)
+
+    async def run(self, func, *args, **kwargs):
+        submitted = time.monotonic()
+
+        def call():
+            started = time.monotonic()
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self._record(started - submitted, time.monotonic() - started, failed)
+
+        with self.lock:
+            self.metrics["in_flight"] += 1
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), call)
+
+    def shutdown(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.metrics)
+        calls = stats["calls"] or 1
+        stats["wait_ms_avg"] = stats["wait_ms_total"] / calls
+        stats["exec_ms_avg"] = stats["exec_ms_total"] / calls
+        return stats
+
+_writer = DbExecutor("writer", 1)
+_readers = DbExecutor("reader", DB_READ_THREADS, initializer=_open_reader)
+
+def db_read(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await _readers.run(func, *args, **kwargs)
+    wrapper.sync = func
+    return wrapper
+
+def db_read_cached(cache, present=None):
+    # Cache hits are answered on the caller's thread; only misses wait for a reader connection.
+    def decorator(load):
+        def lookup(key):
+            value = cache.get(key)
+            if value is None or present is None:
+                return value
+            return present(value)
+
+        @functools.wraps(load)
+        async def wrapper(key):
+            value = lookup(key)
+            if value is not None:
+                return value
+            return await _readers.run(load, key)
+
+        def sync(key):
+            value = lookup(key)
+            return value if value is not None else load(key)
+
+        wrapper.sync = sync
+        return wrapper
+    return decorator
+
+def db_write(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await _writer.run(func, *args, **kwargs)
+    wrapper.sync = func
+    return wrapper
+
+def get_db_executor_stats():
+    return {"writer": _writer.stats(), "reader": _readers.stats()}
+
+def close_db():
+    global _conn
+    _writer.shutdown()
+    _readers.shutdown()
+    write_behind.flush()
+    with _lock:
+        for conn in _read_conns:
+            conn.close()
+        _read_conns.clear()
+        if _conn is not None:
+            _conn.execute("PRAGMA optimize")
+            _conn.close()
+            _conn = None
+
+def utc_timestamp():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+class WriteBehindBuffer:
+    def __init__(self, max_pending, interval):
+        self.max_pending = max_pending
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.touches = {}
+        self.activity = []
+        self.last_flush = time.monotonic()
+        self.metrics = {
+            "touches": 0,
+            "coalesced": 0,
+            "activity": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "late_flushes": 0,
+            "failed_flushes": 0,
+            "rows_written": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def touch_user(self, user_id):
+        with self.lock:
+            self.metrics["touches"] += 1
+            if user_id in self.touches:
+                self.metrics["coalesced"] += 1
+            elif len(self.touches) >= self.max_pending:
+                self.metrics["dropped"] += 1
+                return
+            self.touches[user_id] = utc_timestamp()
+
+    def log_activity(self, user_id, action):
+        with self.lock:
+            if len(self.activity) >= self.max_pending:
+                self.metrics["dropped"] += 1
+                return
+            self.metrics["activity"] += 1
+            self.activity.append((user_id, action, utc_timestamp()))
+
+    def pending(self):
+        with self.lock:
+            return len(self.touches) + len(self.activity)
+
+    def flush(self):
+        with self.lock:
+            touches, self.touches = self.touches, {}
+            activity, self.activity = self.activity, []
+        now = time.monotonic()
+        if now - self.last_flush > self.interval * 2:
+            self.metrics["late_flushes"] += 1
+        self.last_flush = now
+        if not touches and not activity:
+            return 0
+        try:
+            with db_cursor() as cur:
+                cur.executemany(
+                    "UPDATE user_profiles SET last_active=? WHERE user_id=?",
+                    [(ts, user_id) for user_id, ts in touches.items()],
+                )
+                cur.executemany(
+                    "INSERT INTO user_activity (user_id, action, created_at) VALUES (?, ?, ?)",
+                    activity,
+                )
+                if activity:
+                    # Hourly buckets only feed the last-24h stat; drop the ones that have aged out.
+                    cur.execute(PRUNE_ACTIVITY_COUNTERS_SQL)
+        except Exception as e:
+            print(f"Write-behind flush failed: {e}")
+            self.metrics["failed_flushes"] += 1
+            with self.lock:
+                for user_id, ts in touches.items():
+                    self.touches.setdefault(user_id, ts)
+                self.activity = (activity + self.activity)[-self.max_pending:]
+            return 0
+        written = len(touches) + len(activity)
+        self.metrics["flushes"] += 1
+        self.metrics["rows_written"] += written
+        self.metrics["last_flush_ms"] = (time.monotonic() - now) * 1000
+        return written
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats["pending"] = self.pending()
+        return stats
+
+write_behind = WriteBehindBuffer(WRITE_BEHIND_MAX_PENDING, WRITE_BEHIND_INTERVAL)
+
+def _migrate_base_schema(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS posts (
+        id TEXT PRIMARY KEY,
+        title TEXT,
+        link TEXT,
+        published TEXT,
+        share_count INTEGER DEFAULT 0,
+        category TEXT,
+        channel_message_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS subscriptions (
+        user_id INTEGER,
+        category TEXT,
+        PRIMARY KEY(user_id, category)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS post_shares (
+        user_id INTEGER,
+        post_id TEXT,
+        shared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY(user_id, post_id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT,
+        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        notifications_enabled INTEGER DEFAULT 1,
+        language TEXT DEFAULT 'en',
+        last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS bookmarks (
+        user_id INTEGER,
+        post_id TEXT,
+        bookmarked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY(user_id, post_id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        message TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'pending'
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_activity (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        action TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS feed_state (
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        body_hash TEXT,
+        checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS outbox_batches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT,
+        text TEXT,
+        parse_mode TEXT DEFAULT 'HTML',
+        total INTEGER DEFAULT 0,
+        sent INTEGER DEFAULT 0,
+        failed INTEGER DEFAULT 0,
+        report_chat_id INTEGER,
+        report_message_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER,
+        chat_id INTEGER,
+        status TEXT DEFAULT 'pending',
+        sent_at TIMESTAMP
+    )
+    """)
+
+def _migrate_posts_channel_message_id(cur):
+    cur.execute("PRAGMA table_info(posts)")
+    columns = [row[1] for row in cur.fetchall()]
+    if "channel_message_id" not in columns:
+        cur.execute("ALTER TABLE posts ADD COLUMN channel_message_id INTEGER")
+
+def _migrate_hot_query_indexes(cur):
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_category ON posts(category)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_share_count ON posts(share_count)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_category ON subscriptions(category, user_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_user_profiles_notifications ON user_profiles(notifications_enabled)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bookmarks_user_time ON bookmarks(user_id, bookmarked_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_feedback_status_created ON feedback(status, created_at)")
+    # Partial, so the pending-outbox plan stays stable once ANALYZE has seen a drained queue.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(id) WHERE status='pending'")
+
+COUNTER_TRIGGERS = [
+    ("trg_posts_insert", "INSERT", "posts", None,
+     [("'posts'", "1"), ("'posts:' || COALESCE(NEW.category, '')", "1")]),
+    ("trg_posts_delete", "DELETE", "posts", None,
+     [("'posts'", "-1"), ("'posts:' || COALESCE(OLD.category, '')", "-1")]),
+    ("trg_posts_category", "UPDATE OF category", "posts", "OLD.category IS NOT NEW.category",
+     [("'posts:' || COALESCE(OLD.category, '')", "-1"), ("'posts:' || COALESCE(NEW.category, '')", "1")]),
+    ("trg_users_insert", "INSERT", "user_profiles", None, [("'users'", "1")]),
+    ("trg_users_delete", "DELETE", "user_profiles", None, [("'users'", "-1")]),
+    ("trg_bookmarks_insert", "INSERT", "bookmarks", None, [("'bookmarks'", "1")]),
+    ("trg_bookmarks_delete", "DELETE", "bookmarks", None, [("'bookmarks'", "-1")]),
+    ("trg_shares_insert", "INSERT", "post_shares", None, [("'shares'", "1")]),
+    ("trg_shares_delete", "DELETE", "post_shares", None, [("'shares'", "-1")]),
+    ("trg_feedback_insert", "INSERT", "feedback", "NEW.status = 'pending'", [("'feedback_pending'", "1")]),
+    ("trg_feedback_delete", "DELETE", "feedback", "OLD.status = 'pending'", [("'feedback_pending'", "-1")]),
+    ("trg_feedback_status", "UPDATE OF status", "feedback", "OLD.status IS NOT NEW.status",
+     [("'feedback_pending'", "(NEW.status = 'pending') - (OLD.status = 'pending')")]),
+    ("trg_activity_insert", "INSERT", "user_activity", None,
+     [("'activity:' || strftime('%Y-%m-%d %H', COALESCE(NEW.created_at, 'now'))", "1")]),
+]
+
+def _migrate_counters(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    for trigger, event, table, when, updates in COUNTER_TRIGGERS:
+        statements = "".join(
+            f"INSERT INTO counters (name, value) VALUES ({name}, {delta}) "
+            f"ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;\n"
+            for name, delta in updates
+        )
+        condition = f"WHEN {when}" if when else ""
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {table} {condition}
+        BEGIN
+        {statements}END
+        """)
+    cur.execute("DELETE FROM counters")
+    cur.execute("INSERT INTO counters (name, value) SELECT 'posts', COUNT(*) FROM posts")
+    cur.execute("""
+        INSERT INTO counters (name, value)
+        SELECT 'posts:' || COALESCE(category, ''), COUNT(*) FROM posts GROUP BY COALESCE(category, '')
+    """)
+    cur.execute("INSERT INTO counters (name, value) SELECT 'users', COUNT(*) FROM user_profiles")
+    cur.execute("INSERT INTO counters (name, value) SELECT 'bookmarks', COUNT(*) FROM bookmarks")
+    cur.execute("INSERT INTO counters (name, value) SELECT 'shares', COUNT(*) FROM post_shares")
+    cur.execute("INSERT INTO counters (name, value) SELECT 'feedback_pending', COUNT(*) FROM feedback WHERE status='pending'")
+    cur.execute("""
+        INSERT INTO counters (name, value)
+        SELECT 'activity:' || strftime('%Y-%m-%d %H', created_at), COUNT(*) FROM user_activity
+        WHERE created_at >= datetime('now', '-1 day')
+        GROUP BY strftime('%Y-%m-%d %H', created_at)
+    """)
+
+def _migrate_summary_cache(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS summaries (
+        content_hash TEXT PRIMARY KEY,
+        url TEXT,
+        article_text TEXT,
+        summary TEXT,
+        caption_key TEXT,
+        caption TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def _migrate_photo_file_ids(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS photo_file_ids (
+        content_hash TEXT PRIMARY KEY,
+        file_id TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def _migrate_feed_schedule(cur):
+    cur.execute("PRAGMA table_info(feed_state)")
+    columns = [row[1] for row in cur.fetchall()]
+    for column, definition in (
+        ("next_due", "REAL DEFAULT 0"),
+        ("poll_interval", "REAL"),
+        ("failures", "INTEGER DEFAULT 0"),
+        ("last_change", "REAL"),
+    ):
+        if column not in columns:
+            cur.execute(f"ALTER TABLE feed_state ADD COLUMN {column} {definition}")
+
+MIGRATIONS = [
+    (1, "base schema", _migrate_base_schema),
+    (2, "posts.channel_message_id", _migrate_posts_channel_message_id),
+    (3, "hot query indexes", _migrate_hot_query_indexes),
+    (4, "trigger-maintained counters", _migrate_counters),
+    (5, "summary cache", _migrate_summary_cache),
+    (6, "telegram photo file ids", _migrate_photo_file_ids),
+    (7, "feed_state schedule", _migrate_feed_schedule),
+]
+
+POSTS_PAGE_SQL = """
+    SELECT rowid, id, title, link, category, share_count
+    FROM posts
+    WHERE rowid {cond} ?
+    ORDER BY rowid {order}
+    LIMIT ?
+"""
+
+CATEGORY_POSTS_PAGE_SQL = """
+    SELECT rowid, id, title, link, category, share_count
+    FROM posts
+    WHERE category=? AND rowid {cond} ?
+    ORDER BY rowid {order}
+    LIMIT ?
+"""
+
+BOOKMARKS_PAGE_SQL = """
+    SELECT CAST(strftime('%s', b.bookmarked_at) AS INTEGER), b.rowid, p.id, p.title, p.link, p.category
+    FROM bookmarks b
+    JOIN posts p ON b.post_id = p.id
+    WHERE b.user_id=? AND (b.bookmarked_at, b.rowid) {cond} (datetime(?, 'unixepoch'), ?)
+    ORDER BY b.bookmarked_at {order}, b.rowid {order}
+    LIMIT ?
+"""
+
+PAGE_DIRECTIONS = {"DESC": "<", "ASC": ">"}
+
+def page_sql(template, order):
+    return template.format(cond=PAGE_DIRECTIONS[order], order=order)
+
+CATEGORY_COUNTS_SQL = "SELECT name, value FROM counters WHERE name >= 'posts:' AND name < 'posts;'"
+
+TOP_SHARED_POSTS_SQL = "SELECT title, share_count FROM posts ORDER BY share_count DESC LIMIT 5"
+
+SUBSCRIBED_USERS_SQL = """
+    SELECT s.user_id FROM subscriptions s
+    JOIN user_profiles u ON s.user_id = u.user_id
+    WHERE s.category=? AND u.notifications_enabled=1
+"""
+
+PENDING_FEEDBACK_SQL = """
+    SELECT id, user_id, message, created_at FROM feedback
+    WHERE status='pending' ORDER BY created_at DESC LIMIT 10
+"""
+
+DAILY_ACTIVITY_SQL = """
+    SELECT COALESCE(SUM(value), 0) FROM counters
+    WHERE name >= 'activity:' || strftime('%Y-%m-%d %H', 'now', '-1 day') AND name < 'activity;'
+"""
+
+PRUNE_ACTIVITY_COUNTERS_SQL = """
+    DELETE FROM counters
+    WHERE name >= 'activity:' AND name < 'activity:' || strftime('%Y-%m-%d %H', 'now', '-1 day')
+"""
+
+PENDING_OUTBOX_SQL = """
+    SELECT o.id, o.batch_id, o.chat_id, b.text, b.parse_mode
+    FROM outbox o
+    JOIN outbox_batches b ON o.batch_id = b.id
+    WHERE o.status='pending'
+    ORDER BY o.id
+    LIMIT ?
+"""
+
+HOT_QUERIES = [
+    ("posts page", page_sql(POSTS_PAGE_SQL, "DESC"), (MAX_ROWID, 6)),
+    ("posts page (newer)", page_sql(POSTS_PAGE_SQL, "ASC"), (0, 6)),
+    ("posts page by category", page_sql(CATEGORY_POSTS_PAGE_SQL, "DESC"), ("Android", MAX_ROWID, 6)),
+    ("posts page by category (newer)", page_sql(CATEGORY_POSTS_PAGE_SQL, "ASC"), ("Android", 0, 6)),
+    ("category counters", CATEGORY_COUNTS_SQL, ()),
+    ("top shared posts", TOP_SHARED_POSTS_SQL, ()),
+    ("subscribed users", SUBSCRIBED_USERS_SQL, ("Android",)),
+    ("bookmarks page", page_sql(BOOKMARKS_PAGE_SQL, "DESC"), (1, MAX_TIMESTAMP, MAX_ROWID, 6)),
+    ("bookmarks page (newer)", page_sql(BOOKMARKS_PAGE_SQL, "ASC"), (1, 0, 0, 6)),
+    ("pending feedback", PENDING_FEEDBACK_SQL, ()),
+    ("daily activity counters", DAILY_ACTIVITY_SQL, ()),
+    ("pending outbox", PENDING_OUTBOX_SQL, (100,)),
+]
+
+def get_schema_version():
+    with db_cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        version = cur.fetchone()[0]
+    return version
+
+def explain_query_plan(sql, params=()):
+    with db_cursor() as cur:
+        cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+        rows = cur.fetchall()
+    return [row[-1] for row in rows]
+
+def check_query_plans():
+    regressions = []
+    for name, sql, params in HOT_QUERIES:
+        for detail in explain_query_plan(sql, params):
+            full_scan = detail.startswith("SCAN ") and " USING " not in detail
+            if full_scan or "TEMP B-TREE" in detail:
+                regressions.append(f"{name}: {detail}")
+    return regressions
+
+def init_database():
+    with db_cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+    current = get_schema_version()
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with db_cursor() as cur:
+            migrate(cur)
+            cur.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+        print(f"Applied migration {version}: {name}")
+    regressions = check_query_plans()
+    if regressions:
+        print("WARNING: hot queries use table scans or temp sorts:\n" + "\n".join(regressions))
+    print("Database initialized successfully!")
+
+@db_read
+def has_post(post_id):
+    with db_cursor() as cur:
+        cur.execute("SELECT id FROM posts WHERE id=?", (post_id,))
+        row = cur.fetchone()
+    return row is not None
+
+@db_write
+def save_post(post_id, title, link, published, category="General", channel_message_id=None):
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT OR IGNORE INTO posts (id, title, link, published, category, channel_message_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (post_id, title, link, published, category, channel_message_id))
+        saved = cur.rowcount > 0
+    if saved:
+        invalidate_views("post_saved")
+    return saved
+
+@db_write
+def update_post_message_id(post_id, channel_message_id):
+    with db_cursor() as cur:
+        cur.execute("UPDATE posts SET channel_message_id=? WHERE id=?", (channel_message_id, post_id))
+
+@db_write
+def increment_share_count(post_id, user_id=None):
+    with db_cursor() as cur:
+        cur.execute("UPDATE posts SET share_count = share_count + 1 WHERE id=?", (post_id,))
+        if user_id:
+            cur.execute("INSERT OR IGNORE INTO post_shares (user_id, post_id) VALUES (?, ?)", (user_id, post_id))
+    if user_id:
+        profile_cache.pop(user_id)
+    invalidate_views("share")
+
+@db_read
+def get_counters(*names):
+    with db_cursor() as cur:
+        cur.execute(
+            f"SELECT name, value FROM counters WHERE name IN ({','.join('?' * len(names))})",
+            names,
+        )
+        values = dict(cur.fetchall())
+    return {name: values.get(name, 0) for name in names}
+
+@db_read
+def get_stats():
+    counters = get_counters.sync("posts", "users")
+    with db_cursor() as cur:
+        cur.execute(TOP_SHARED_POSTS_SQL)
+        top_posts = cur.fetchall()
+    return counters["posts"], counters["users"], top_posts
+
+async def get_or_create_user(user_id, username=None, first_name=None):
+    if user_cache.get(user_id) is not None:
+        write_behind.touch_user(user_id)
+        return
+    await _writer.run(_load_or_create_user, user_id, username, first_name)
+
+def _load_or_create_user(user_id, username, first_name):
+    with db_cursor() as cur:
+        cur.execute("SELECT notifications_enabled FROM user_profiles WHERE user_id=?", (user_id,))
+        row = cur.fetchone()
+        if not row:
+            cur.execute("""
+                INSERT INTO user_profiles (user_id, username, first_name)
+                VALUES (?, ?, ?)
+            """, (user_id, username, first_name))
+    user_cache.set(user_id, row[0] == 1 if row else True)
+    if row:
+        write_behind.touch_user(user_id)
+    else:
+        profile_cache.pop(user_id)
+        invalidate_views("user_created")
+
+@db_read_cached(profile_cache)
+def get_user_profile(user_id):
+    generation = profile_cache.generation
+    with db_cursor() as cur:
+        cur.execute("SELECT * FROM user_profiles WHERE user_id=?", (user_id,))
+        profile = cur.fetchone()
+        cur.execute("SELECT COUNT(*) FROM post_shares WHERE user_id=?", (user_id,))
+        shares = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM bookmarks WHERE user_id=?", (user_id,))
+        bookmarks = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM subscriptions WHERE user_id=?", (user_id,))
+        subs = cur.fetchone()[0]
+    result = (profile, shares, bookmarks, subs)
+    if profile:
+        profile_cache.set(user_id, result, generation)
+    return result
+
+@db_read_cached(subscription_cache, list)
+def get_user_subscriptions(user_id):
+    generation = subscription_cache.generation
+    with db_cursor() as cur:
+        cur.execute("SELECT category FROM subscriptions WHERE user_id=?", (user_id,))
+        rows = cur.fetchall()
+    subs = frozenset(r[0] for r in rows)
+    subscription_cache.set(user_id, subs, generation)
+    return list(subs)
+
+@db_write
+def toggle_subscription(user_id, category):
+    with db_cursor() as cur:
+        cur.execute("SELECT * FROM subscriptions WHERE user_id=? AND category=?", (user_id, category))
+        if cur.fetchone():
+            cur.execute("DELETE FROM subscriptions WHERE user_id=? AND category=?", (user_id, category))
+            result = False
+        else:
+            cur.execute("INSERT INTO subscriptions (user_id, category) VALUES (?, ?)", (user_id, category))
+            result = True
+    subscription_cache.pop(user_id)
+    profile_cache.pop(user_id)
+    subscribers_cache.pop(category)
+    return result
+
+@db_read
+def get_bookmarks_page(user_id, limit=5, before=None, after=None):
+    if after is not None:
+        order, cursor = "ASC", after
+    else:
+        order, cursor = "DESC", before or (MAX_TIMESTAMP, MAX_ROWID)
+    with db_cursor() as cur:
+        cur.execute(page_sql(BOOKMARKS_PAGE_SQL, order), (user_id, cursor[0], cursor[1], limit + 1))
+        rows = cur.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is not None:
+        rows.reverse()
+    return rows, has_more
+
+@db_write
+def toggle_bookmark(user_id, post_id):
+    with db_cursor() as cur:
+        cur.execute("SELECT * FROM bookmarks WHERE user_id=? AND post_id=?", (user_id, post_id))
+        if cur.fetchone():
+            cur.execute("DELETE FROM bookmarks WHERE user_id=? AND post_id=?", (user_id, post_id))
+            result = False
+        else:
+            cur.execute("INSERT INTO bookmarks (user_id, post_id) VALUES (?, ?)", (user_id, post_id))
+            result = True
+    profile_cache.pop(user_id)
+    return result
+
+@db_read
+def is_bookmarked(user_id, post_id):
+    with db_cursor() as cur:
+        cur.execute("SELECT * FROM bookmarks WHERE user_id=? AND post_id=?", (user_id, post_id))
+        result = cur.fetchone() is not None
+    return result
+
+@db_read
+def get_post(post_id):
+    with db_cursor() as cur:
+        cur.execute("SELECT id, title, link, category, share_count FROM posts WHERE id=?", (post_id,))
+        post = cur.fetchone()
+    return post
+
+@db_read
+def get_post_share_info(post_id):
+    with db_cursor() as cur:
+        cur.execute("SELECT title, link, channel_message_id FROM posts WHERE id=?", (post_id,))
+        post = cur.fetchone()
+    return post
+
+@db_read
+def get_posts_page(limit=5, category=None, before=None, after=None):
+    if after is not None:
+        order, cursor = "ASC", after
+    else:
+        order, cursor = "DESC", before or MAX_ROWID
+    with db_cursor() as cur:
+        if category:
+            cur.execute(page_sql(CATEGORY_POSTS_PAGE_SQL, order), (category, cursor, limit + 1))
+        else:
+            cur.execute(page_sql(POSTS_PAGE_SQL, order), (cursor, limit + 1))
+        rows = cur.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is not None:
+        rows.reverse()
+    return rows, has_more
+
+@db_read
+def get_category_counts():
+    with db_cursor() as cur:
+        cur.execute(CATEGORY_COUNTS_SQL)
+        rows = cur.fetchall()
+    return {name[len("posts:"):]: value for name, value in rows}
+
+@db_write
+def save_feedback(user_id, message):
+    with db_cursor() as cur:
+        cur.execute("INSERT INTO feedback (user_id, message) VALUES (?, ?)", (user_id, message))
+
+@db_read
+def get_pending_feedback():
+    with db_cursor() as cur:
+        cur.execute(PENDING_FEEDBACK_SQL)
+        rows = cur.fetchall()
+    return rows
+
+@db_write
+def toggle_notifications(user_id):
+    with db_cursor() as cur:
+        cur.execute("SELECT notifications_enabled FROM user_profiles WHERE user_id=?", (user_id,))
+        row = cur.fetchone()
+        if row:
+            new_val = 0 if row[0] == 1 else 1
+            cur.execute("UPDATE user_profiles SET notifications_enabled=? WHERE user_id=?", (new_val, user_id))
+            result = new_val == 1
+        else:
+            result = True
+    if row:
+        user_cache.set(user_id, result)
+    profile_cache.pop(user_id)
+    subscribers_cache.clear()
+    return result
+
+@db_read_cached(user_cache)
+def get_notifications_status(user_id):
+    generation = user_cache.generation
+    with db_cursor() as cur:
+        cur.execute("SELECT notifications_enabled FROM user_profiles WHERE user_id=?", (user_id,))
+        row = cur.fetchone()
+    if row:
+        user_cache.set(user_id, row[0] == 1, generation)
+    return row[0] == 1 if row else True
+
+@db_read_cached(subscribers_cache, list)
+def get_subscribed_users(category):
+    generation = subscribers_cache.generation
+    with db_cursor() as cur:
+        cur.execute(SUBSCRIBED_USERS_SQL, (category,))
+        rows = cur.fetchall()
+    users = tuple(r[0] for r in rows)
+    subscribers_cache.set(category, users, generation)
+    return list(users)
+
+def log_activity(user_id, action):
+    write_behind.log_activity(user_id, action)
+
+@db_write
+def flush_write_behind():
+    return write_behind.flush()
+
+def get_write_behind_stats():
+    return write_behind.stats()
+
+@db_read
+def get_admin_stats():
+    counters = get_counters.sync("users", "posts", "bookmarks", "shares", "feedback_pending")
+    with db_cursor() as cur:
+        cur.execute(DAILY_ACTIVITY_SQL)
+        daily_activity = cur.fetchone()[0]
+    return {
+        "users": counters["users"],
+        "posts": counters["posts"],
+        "bookmarks": counters["bookmarks"],
+        "shares": counters["shares"],
+        "pending_feedback": counters["feedback_pending"],
+        "daily_activity": daily_activity
+    }
+
+@db_read
+def get_summary(content_hash):
+    with db_cursor() as cur:
+        cur.execute("SELECT summary, caption_key, caption FROM summaries WHERE content_hash=?", (content_hash,))
+        row = cur.fetchone()
+    return row
+
+@db_write
+def save_summary(content_hash, url, article_text, summary, caption_key, caption):
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO summaries (content_hash, url, article_text, summary, caption_key, caption)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET
+                url=excluded.url,
+                summary=excluded.summary,
+                caption_key=excluded.caption_key,
+                caption=excluded.caption,
+                created_at=CURRENT_TIMESTAMP
+        """, (content_hash, url, article_text, summary, caption_key, caption))
+        cur.execute("DELETE FROM summaries WHERE created_at < datetime('now', '-30 days')")
+
+@db_read
+def get_photo_file_id(content_hash):
+    with db_cursor() as cur:
+        cur.execute("SELECT file_id FROM photo_file_ids WHERE content_hash=?", (content_hash,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+@db_write
+def save_photo_file_id(content_hash, file_id):
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO photo_file_ids (content_hash, file_id) VALUES (?, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET file_id=excluded.file_id, created_at=CURRENT_TIMESTAMP
+        """, (content_hash, file_id))
+
+@db_write
+def forget_photo_file_id(content_hash):
+    with db_cursor() as cur:
+        cur.execute("DELETE FROM photo_file_ids WHERE content_hash=?", (content_hash,))
+
+@db_read
+def get_feed_state(url):
+    with db_cursor() as cur:
+        cur.execute("SELECT etag, last_modified, body_hash FROM feed_state WHERE url=?", (url,))
+        row = cur.fetchone()
+    return row if row else (None, None, None)
+
+@db_write
+def save_feed_state(url, etag, last_modified, body_hash):
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO feed_state (url, etag, last_modified, body_hash, checked_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(url) DO UPDATE SET
+                etag=excluded.etag,
+                last_modified=excluded.last_modified,
+                body_hash=excluded.body_hash,
+                checked_at=excluded.checked_at
+        """, (url, etag, last_modified, body_hash))
+
+@db_read
+def get_feed_schedules():
+    with db_cursor() as cur:
+        cur.execute("SELECT url, next_due, poll_interval, failures, last_change FROM feed_state")
+        return cur.fetchall()
+
+@db_write
+def save_feed_schedule(url, next_due, poll_interval, failures, last_change):
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO feed_state (url, next_due, poll_interval, failures, last_change)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                next_due=excluded.next_due,
+                poll_interval=excluded.poll_interval,
+                failures=excluded.failures,
+                last_change=excluded.last_change
+        """, (url, next_due, poll_interval, failures, last_change))
+
+@db_write
+def enqueue_broadcast(text, report_chat_id=None, report_message_id=None):
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO outbox_batches (kind, text, report_chat_id, report_message_id)
+            VALUES ('broadcast', ?, ?, ?)
+        """, (text, report_chat_id, report_message_id))
+        batch_id = cur.lastrowid
+        cur.execute("""
+            INSERT INTO outbox (batch_id, chat_id)
+            SELECT ?, user_id FROM user_profiles WHERE notifications_enabled=1
+        """, (batch_id,))
+        total = cur.rowcount
+        cur.execute("""
+            UPDATE outbox_batches SET total=?, finished_at=CASE WHEN ?=0 THEN CURRENT_TIMESTAMP END
+            WHERE id=?
+        """, (total, total, batch_id))
+    return batch_id, total
+
+@db_write
+def enqueue_notification(category, text):
+    subscribed = get_subscribed_users.sync(category)
+    with db_cursor() as cur:
+        cur.execute("INSERT INTO outbox_batches (kind, text) VALUES ('notification', ?)", (text,))
+        batch_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO outbox (batch_id, chat_id) VALUES (?, ?)",
+            [(batch_id, user_id) for user_id in subscribed],
+        )
+        total = len(subscribed)
+        cur.execute("""
+            UPDATE outbox_batches SET total=?, finished_at=CASE WHEN ?=0 THEN CURRENT_TIMESTAMP END
+            WHERE id=?
+        """, (total, total, batch_id))
+    return batch_id, total
+
+@db_read
+def get_pending_outbox(limit):
+    with db_cursor() as cur:
+        cur.execute(PENDING_OUTBOX_SQL, (limit,))
+        rows = cur.fetchall()
+    return rows
+
+@db_write
+def complete_outbox(results):
+    with db_cursor() as cur:
+        cur.executemany(
+            "UPDATE outbox SET status=?, sent_at=CURRENT_TIMESTAMP WHERE id=?",
+            [("sent" if ok else "failed", row_id) for row_id, batch_id, ok in results],
+        )
+        totals = {}
+        for row_id, batch_id, ok in results:
+            sent, failed = totals.get(batch_id, (0, 0))
+            totals[batch_id] = (sent + 1, failed) if ok else (sent, failed + 1)
+        cur.executemany(
+            "UPDATE outbox_batches SET sent=sent+?, failed=failed+? WHERE id=?",
+            [(sent, failed, batch_id) for batch_id, (sent, failed) in totals.items()],
+        )
+        cur.execute("""
+            UPDATE outbox_batches SET finished_at=CURRENT_TIMESTAMP
+            WHERE finished_at IS NULL AND sent + failed >= total
+        """)
+        cur.execute("""
+            DELETE FROM outbox WHERE status != 'pending' AND batch_id IN (
+                SELECT id FROM outbox_batches WHERE finished_at < datetime('now', '-1 day')
+            )
+        """)
+
+@db_read
+def get_outbox_batch(batch_id):
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT kind, total, sent, failed, report_chat_id, report_message_id, finished_at
+            FROM outbox_batches WHERE id=?
+        """, (batch_id,))
+        row = cur.fetchone()
+    return row
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    if sys.argv[1:] != ["--check-plans"]:
+        sys.exit("usage: python db.py --check-plans")
+    with tempfile.TemporaryDirectory() as directory:
+        DB_FILE = os.path.join(directory, "plans.db")
+        init_database()
+        regressions = check_query_plans()
+        close_db()
+    if regressions:
+        sys.exit("Hot queries regressed to table scans or temp sorts:\n" + "\n".join(regressions))
+    print(f"{len(HOT_QUERIES)} hot queries use indexes")
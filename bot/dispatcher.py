@@ -0,0 +1,147 @@
+import os
+import time
+import asyncio
+from telegram.error import RetryAfter, Forbidden, BadRequest, NetworkError
+
+DISPATCH_GLOBAL_RATE = float(os.environ.get("DISPATCH_GLOBAL_RATE", "30"))
+DISPATCH_PER_CHAT_INTERVAL = float(os.environ.get("DISPATCH_PER_CHAT_INTERVAL", "1.0"))
+DISPATCH_CONCURRENCY = int(os.environ.get("DISPATCH_CONCURRENCY", "20"))
+DISPATCH_MAX_RETRIES = int(os.environ.get("DISPATCH_MAX_RETRIES", "3"))
+DISPATCH_PROGRESS_INTERVAL = float(os.environ.get("DISPATCH_PROGRESS_INTERVAL", "5"))
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class DispatchStats:
+    def __init__(self, total):
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.retried = 0
+        self.flood_waits = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self):
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return (
+            f"{self.sent}/{self.total} sent, {self.failed} failed, {self.blocked} blocked, "
+            f"{self.retried} retries, {self.rate:.1f} msg/s"
+        )
+
+class Dispatcher:
+    def __init__(self, bot, rate=DISPATCH_GLOBAL_RATE, per_chat_interval=DISPATCH_PER_CHAT_INTERVAL,
+                 concurrency=DISPATCH_CONCURRENCY, max_retries=DISPATCH_MAX_RETRIES):
+        self.bot = bot
+        self.bucket = TokenBucket(rate)
+        self.per_chat_interval = per_chat_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.chat_next = {}
+
+    async def _wait_chat(self, chat_id):
+        now = time.monotonic()
+        if len(self.chat_next) > 10000:
+            self.chat_next = {cid: t for cid, t in self.chat_next.items() if t > now}
+        ready = self.chat_next.get(chat_id, 0.0)
+        self.chat_next[chat_id] = max(now, ready) + self.per_chat_interval
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+    async def send(self, chat_id, text, parse_mode="HTML", stats=None):
+        attempt = 0
+        while True:
+            await self._wait_chat(chat_id)
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                if stats:
+                    stats.sent += 1
+                return True
+            except RetryAfter as e:
+                print(f"Flood control hit, waiting {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+                if stats:
+                    stats.flood_waits += 1
+                    stats.retried += 1
+                continue
+            except Forbidden:
+                if stats:
+                    stats.blocked += 1
+                return False
+            except BadRequest as e:
+                print(f"Cannot send to {chat_id}: {e}")
+                if stats:
+                    stats.failed += 1
+                return False
+            except NetworkError as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    print(f"Giving up on {chat_id} after {attempt} attempts: {e}")
+                    if stats:
+                        stats.failed += 1
+                    return False
+                if stats:
+                    stats.retried += 1
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                print(f"Error sending to {chat_id}: {e}")
+                if stats:
+                    stats.failed += 1
+                return False
+
+    async def send_all(self, messages):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_one(chat_id, text, parse_mode, stats):
+            async with semaphore:
+                return await self.send(chat_id, text, parse_mode, stats)
+
+        return await asyncio.gather(*[send_one(*message) for message in messages])
+
+_dispatcher = None
+
+def get_dispatcher(bot):
+    global _dispatcher
+    if _dispatcher is None or _dispatcher.bot is not bot:
+        _dispatcher = Dispatcher(bot)
+    return _dispatcher
@@ -0,0 +1,282 @@
+import os
+import time
+import asyncio
+from http_client import get_client
+
+HF_API_URL = os.environ.get("HF_API_URL", "https://router.huggingface.co/hf-inference/models/facebook/bart-large-cnn")
+HF_DEADLINE = float(os.environ.get("HF_DEADLINE", "20"))
+HF_MIN_TIMEOUT = float(os.environ.get("HF_MIN_TIMEOUT", "2"))
+HF_BREAKER_THRESHOLD = int(os.environ.get("HF_BREAKER_THRESHOLD", "3"))
+HF_BREAKER_COOLDOWN = float(os.environ.get("HF_BREAKER_COOLDOWN", "300"))
+HF_BATCH_SIZE = int(os.environ.get("HF_BATCH_SIZE", "4"))
+HF_BATCH_WAIT = float(os.environ.get("HF_BATCH_WAIT", "0.5"))
+
+class CircuitBreaker:
+    def __init__(self, threshold=HF_BREAKER_THRESHOLD, cooldown=HF_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self, cooldown=None):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            if self.opened_at is None or self.probing:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+            if cooldown:
+                self.opened_at += max(0.0, cooldown - self.cooldown)
+        self.probing = False
+
+    def release(self):
+        self.probing = False
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+class HuggingFaceClient:
+    def __init__(self, url=HF_API_URL, deadline=HF_DEADLINE, breaker=None):
+        self.url = url
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "loading": 0,
+            "skipped": 0,
+            "last_ms": 0.0,
+            "total_ms": 0.0,
+        }
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        hf_token = os.environ.get("HUGGINGFACE_TOKEN", "")
+        if hf_token:
+            headers["Authorization"] = f"Bearer {hf_token}"
+        return headers
+
+    def _timeout(self, deadline):
+        timeout = self.deadline
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+        return timeout
+
+    async def summarize(self, text, max_length=1500, min_length=500, deadline=None):
+        results = await self.summarize_batch([text], max_length, min_length, deadline)
+        return results[0] if results else None
+
+    async def summarize_batch(self, texts, max_length=1500, min_length=500, deadline=None):
+        timeout = self._timeout(deadline)
+        if timeout < HF_MIN_TIMEOUT or not self.breaker.allow():
+            self.metrics["skipped"] += len(texts)
+            return None
+        probe = self.breaker.probing
+        try:
+            return await self._post(texts, max_length, min_length, timeout)
+        finally:
+            # Whatever happened to the call (including cancellation), the half-open probe is over.
+            if probe:
+                self.breaker.release()
+
+    async def _post(self, texts, max_length, min_length, timeout):
+        inputs = [text[:4000] for text in texts]
+        payload = {
+            "inputs": inputs[0] if len(inputs) == 1 else inputs,
+            "parameters": {
+                "max_length": max_length,
+                "min_length": min_length,
+                "do_sample": False
+            },
+            "options": {
+                "wait_for_model": False
+            }
+        }
+
+        self.metrics["calls"] += 1
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                get_client().post(self.url, headers=self._headers(), json=payload, timeout=timeout),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            print(f"HuggingFace call exceeded its {timeout:.1f}s deadline")
+            self.metrics["timeouts"] += 1
+            self._finish(started, ok=False)
+            return None
+        except Exception as e:
+            print(f"HuggingFace summarization failed: {e}")
+            self._finish(started, ok=False)
+            return None
+
+        if response.status_code == 200:
+            try:
+                result = response.json()
+            except ValueError:
+                print(f"HuggingFace returned a non-JSON body: {response.text[:100]}")
+                result = None
+            if isinstance(result, list) and len(result) > 0:
+                summaries = [None] * len(texts)
+                for i, item in enumerate(result[:len(texts)]):
+                    if isinstance(item, list) and item:
+                        item = item[0]
+                    if isinstance(item, dict) and item.get('summary_text'):
+                        summaries[i] = item['summary_text']
+                if any(summaries):
+                    done = sum(1 for summary in summaries if summary)
+                    print(f"HuggingFace summarization successful: {done}/{len(texts)} items")
+                    self._finish(started, ok=True)
+                    return summaries
+            self._finish(started, ok=False)
+        elif response.status_code == 503:
+            estimated = None
+            try:
+                estimated = float(response.json().get("estimated_time") or 0)
+            except (ValueError, AttributeError):
+                pass
+            print(f"HuggingFace model loading (estimated {estimated or '?'}s), skipping")
+            self.metrics["loading"] += 1
+            self._finish(started, ok=False, cooldown=estimated)
+        else:
+            print(f"HuggingFace API error: {response.status_code} - {response.text[:100]}")
+            self._finish(started, ok=False)
+        return None
+
+    def _finish(self, started, ok, cooldown=None):
+        elapsed = (time.monotonic() - started) * 1000
+        self.metrics["last_ms"] = elapsed
+        self.metrics["total_ms"] += elapsed
+        if ok:
+            self.metrics["successes"] += 1
+            self.breaker.record_success()
+        else:
+            self.metrics["failures"] += 1
+            self.breaker.record_failure(cooldown)
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats["avg_ms"] = stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+        stats["state"] = self.breaker.state
+        stats["trips"] = self.breaker.trips
+        stats["retry_in"] = self.breaker.retry_in()
+        return stats
+
+class PendingSummary:
+    def __init__(self, text, max_length, min_length, deadline, future):
+        self.text = text
+        self.max_length = max_length
+        self.min_length = min_length
+        self.deadline = deadline
+        self.future = future
+
+class SummaryBatcher:
+    def __init__(self, client, batch_size=HF_BATCH_SIZE, max_wait=HF_BATCH_WAIT):
+        self.client = client
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.pending = []
+        self.timer = None
+        self.tasks = set()
+        self.metrics = {
+            "batches": 0,
+            "items": 0,
+            "fallbacks": 0,
+        }
+
+    async def summarize(self, text, max_length=1500, min_length=500, deadline=None):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(PendingSummary(text, max_length, min_length, deadline, future))
+        if len(self.pending) >= self.batch_size:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self._spawn(self._flush())
+        elif self.timer is None:
+            self.timer = self._spawn(self._flush_later())
+        return await future
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_wait)
+        self.timer = None
+        await self._flush()
+
+    async def _flush(self):
+        batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+        if not batch:
+            return
+        if len(self.pending) >= self.batch_size:
+            self._spawn(self._flush())
+        elif self.pending and self.timer is None:
+            self.timer = self._spawn(self._flush_later())
+        # Caption budgets differ by a few tokens per title; one request needs one set of
+        # parameters, and the caption formatter trims any overshoot sentence-wise.
+        max_length = max(item.max_length for item in batch)
+        min_length = min(item.min_length for item in batch)
+        deadlines = [item.deadline for item in batch if item.deadline is not None]
+        deadline = min(deadlines) if deadlines else None
+        self.metrics["batches"] += 1
+        self.metrics["items"] += len(batch)
+        try:
+            results = await self.client.summarize_batch(
+                [item.text for item in batch], max_length, min_length, deadline
+            )
+            if results is not None and len(batch) > 1:
+                for i, item in enumerate(batch):
+                    if not results[i]:
+                        self.metrics["fallbacks"] += 1
+                        results[i] = await self.client.summarize(
+                            item.text, item.max_length, item.min_length, item.deadline
+                        )
+        except Exception as e:
+            print(f"HuggingFace batch failed: {e}")
+            results = None
+        for i, item in enumerate(batch):
+            if not item.future.done():
+                item.future.set_result(results[i] if results else None)
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats["avg_batch"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+hf_client = HuggingFaceClient()
+summary_batcher = SummaryBatcher(hf_client)
+
+def get_hf_stats():
+    stats = hf_client.stats()
+    stats["batching"] = summary_batcher.stats()
+    return stats
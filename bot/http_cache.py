@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from http_client import get_client
+
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", "http_cache")
+HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+CACHE_TTLS = {
+    "page": 60 * 60,
+    "image": 24 * 60 * 60,
+    "static": 7 * 24 * 60 * 60,
+}
+
+class CachedResponse:
+    def __init__(self, status_code, content, headers, from_cache=False, truncated=False):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+        self.truncated = truncated
+
+class HttpCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "stale_served": 0,
+            "stores": 0,
+            "evictions": 0,
+            "truncated": 0,
+        }
+        self._loaded = False
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            try:
+                with open(self._path(key, "json")) as f:
+                    meta = json.load(f)
+                accessed = os.path.getmtime(self._path(key, "body"))
+            except (OSError, ValueError):
+                self._remove_files(key)
+                continue
+            found.append((accessed, key, meta))
+        found.sort()
+        for _, key, meta in found:
+            self.entries[key] = meta
+            self.total_bytes += meta.get("size", 0)
+
+    def _remove_files(self, key):
+        for suffix in ("body", "json"):
+            try:
+                os.remove(self._path(key, suffix))
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, meta = self.entries.popitem(last=False)
+            self.total_bytes -= meta.get("size", 0)
+            self._remove_files(key)
+            self.counters["evictions"] += 1
+
+    def lookup(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        with self.lock:
+            self._load()
+            meta = self.entries.get(key)
+            if meta is None:
+                return None, None
+            self.entries.move_to_end(key)
+        try:
+            with open(self._path(key, "body"), "rb") as f:
+                body = f.read()
+            os.utime(self._path(key, "body"))
+        except OSError:
+            with self.lock:
+                if self.entries.pop(key, None) is not None:
+                    self.total_bytes -= meta.get("size", 0)
+            return None, None
+        return meta, body
+
+    def is_fresh(self, meta):
+        ttl = CACHE_TTLS.get(meta.get("kind"), 0)
+        return time.time() - meta.get("stored_at", 0) < ttl
+
+    def store(self, url, kind, body, headers):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        meta = {
+            "url": url,
+            "kind": kind,
+            "content_type": headers.get("content-type", ""),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "stored_at": time.time(),
+            "size": len(body),
+        }
+        with self.lock:
+            self._load()
+            try:
+                with open(self._path(key, "body"), "wb") as f:
+                    f.write(body)
+                with open(self._path(key, "json"), "w") as f:
+                    json.dump(meta, f)
+            except OSError as e:
+                print(f"Error writing HTTP cache entry: {e}")
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.get("size", 0)
+            self.entries[key] = meta
+            self.total_bytes += meta["size"]
+            self.counters["stores"] += 1
+            self._evict()
+
+    def touch(self, url, headers):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        with self.lock:
+            meta = self.entries.get(key)
+            if meta is None:
+                return
+            meta["stored_at"] = time.time()
+            if headers.get("etag"):
+                meta["etag"] = headers.get("etag")
+            if headers.get("last-modified"):
+                meta["last_modified"] = headers.get("last-modified")
+            try:
+                with open(self._path(key, "json"), "w") as f:
+                    json.dump(meta, f)
+            except OSError as e:
+                print(f"Error updating HTTP cache entry: {e}")
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.entries)
+            stats["bytes"] = self.total_bytes
+        return stats
+
+http_cache = HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES)
+
+def _cached_response(meta, body):
+    return CachedResponse(200, body, {"content-type": meta.get("content_type", "")}, from_cache=True)
+
+async def _get_capped(url, headers, timeout, max_bytes):
+    async with get_client().stream("GET", url, headers=headers, timeout=timeout) as response:
+        chunks = []
+        size = 0
+        truncated = False
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                http_cache.counters["truncated"] += 1
+                truncated = True
+                break
+        return CachedResponse(response.status_code, b"".join(chunks)[:max_bytes], response.headers,
+                              truncated=truncated)
+
+async def cached_get(url, kind="page", headers=None, timeout=20, max_bytes=None):
+    meta, body = await asyncio.to_thread(http_cache.lookup, url)
+    if meta is not None and http_cache.is_fresh(meta):
+        http_cache.counters["hits"] += 1
+        return _cached_response(meta, body)
+
+    request_headers = dict(headers or {})
+    if meta is not None:
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        if max_bytes:
+            response = await _get_capped(url, request_headers, timeout, max_bytes)
+        else:
+            response = await get_client().get(url, headers=request_headers, timeout=timeout)
+    except Exception:
+        if meta is not None:
+            http_cache.counters["stale_served"] += 1
+            return _cached_response(meta, body)
+        raise
+
+    if response.status_code == 304 and meta is not None:
+        http_cache.counters["revalidated"] += 1
+        await asyncio.to_thread(http_cache.touch, url, response.headers)
+        return _cached_response(meta, body)
+
+    http_cache.counters["misses"] += 1
+    # A truncated body is not the resource; serve it this once but never cache it.
+    if response.status_code == 200 and not getattr(response, "truncated", False):
+        await asyncio.to_thread(http_cache.store, url, kind, response.content, response.headers)
+    return CachedResponse(response.status_code, response.content, response.headers,
+                          truncated=getattr(response, "truncated", False))
+
+def get_cache_stats():
+    return http_cache.stats()
@@ -0,0 +1,143 @@
+import os
+import asyncio
+from io import BytesIO
+from PIL import Image, UnidentifiedImageError
+from cache import TTLCache
+from http_cache import cached_get
+from http_client import USER_AGENT
+
+IMAGE_MAX_DOWNLOAD_BYTES = int(os.environ.get("IMAGE_MAX_DOWNLOAD_BYTES", str(20 * 1024 * 1024)))
+IMAGE_MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", "2560"))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_CACHE_SIZE = int(os.environ.get("IMAGE_CACHE_SIZE", "32"))
+IMAGE_CACHE_TTL = int(os.environ.get("IMAGE_CACHE_TTL", str(24 * 60 * 60)))
+
+TELEGRAM_PHOTO_MAX_BYTES = 10 * 1024 * 1024
+TELEGRAM_PHOTO_MAX_RATIO = 20
+
+FALLBACK_IMAGE_URL = "https://upload.wikimedia.org/wikipedia/commons/thumb/6/6b/WhatsApp.svg/512px-WhatsApp.svg.png"
+
+IMAGE_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "image/webp,image/apng,image/*,*/*;q=0.8",
+    "Referer": "https://wabetainfo.com/"
+}
+
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png"}
+
+image_cache = TTLCache("images", IMAGE_CACHE_SIZE, IMAGE_CACHE_TTL)
+
+metrics = {
+    "downloads": 0,
+    "passthrough": 0,
+    "recompressed": 0,
+    "rejected": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+}
+
+_fallback = None
+
+def _has_alpha(image):
+    return image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+def _encode(image, fmt, quality=IMAGE_JPEG_QUALITY):
+    out = BytesIO()
+    if fmt == "PNG":
+        image.save(out, "PNG", optimize=True)
+    else:
+        if _has_alpha(image):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+# Returns (bytes, extension) ready for send_photo, or None if Telegram would refuse the image.
+def prepare_image(data):
+    try:
+        image = Image.open(BytesIO(data))
+        fmt = image.format
+        width, height = image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return None
+    if not width or not height or max(width, height) / min(width, height) > TELEGRAM_PHOTO_MAX_RATIO:
+        return None
+
+    fits = max(width, height) <= IMAGE_MAX_SIDE and len(data) <= TELEGRAM_PHOTO_MAX_BYTES
+    if fits and fmt in EXTENSIONS:
+        metrics["passthrough"] += 1
+        return data, EXTENSIONS[fmt]
+
+    try:
+        if fmt == "JPEG":
+            # Let libjpeg decode at a reduced scale instead of inflating the full frame.
+            image.draft("RGB", (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+        image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+        if fmt == "PNG" or (_has_alpha(image) and fmt != "JPEG"):
+            prepared = _encode(image, "PNG")
+            if len(prepared) <= TELEGRAM_PHOTO_MAX_BYTES:
+                metrics["recompressed"] += 1
+                return prepared, ".png"
+        for quality in (IMAGE_JPEG_QUALITY, 70, 55):
+            prepared = _encode(image, "JPEG", quality)
+            if len(prepared) <= TELEGRAM_PHOTO_MAX_BYTES:
+                metrics["recompressed"] += 1
+                return prepared, ".jpg"
+    except OSError as e:
+        print(f"Error preparing image: {e}")
+    return None
+
+def as_upload(prepared):
+    data, extension = prepared
+    img_data = BytesIO(data)
+    img_data.name = f"image{extension}"
+    return img_data
+
+async def _fetch_prepared(url, kind, timeout):
+    response = await cached_get(url, kind=kind, headers=IMAGE_HEADERS, timeout=timeout,
+                                max_bytes=IMAGE_MAX_DOWNLOAD_BYTES)
+    content_type = response.headers.get('content-type', '')
+    print(f"Response status: {response.status_code}, Content-Type: {content_type}, Size: {len(response.content)}")
+    if response.status_code != 200 or response.truncated:
+        return None
+    metrics["downloads"] += 1
+    prepared = await asyncio.to_thread(prepare_image, response.content)
+    if prepared is None:
+        metrics["rejected"] += 1
+        return None
+    metrics["bytes_in"] += len(response.content)
+    metrics["bytes_out"] += len(prepared[0])
+    return prepared
+
+async def load_image(url):
+    generation = image_cache.generation
+    prepared = image_cache.get(url)
+    if prepared is None:
+        print(f"Attempting to download image from: {url}")
+        try:
+            prepared = await _fetch_prepared(url, "image", 20)
+        except Exception as e:
+            print(f"Error downloading image: {e}")
+            return None
+        if prepared is None:
+            return None
+        image_cache.set(url, prepared, generation)
+    return as_upload(prepared)
+
+async def fallback_image():
+    global _fallback
+    if _fallback is None:
+        try:
+            print(f"Trying fallback: {FALLBACK_IMAGE_URL}")
+            _fallback = await _fetch_prepared(FALLBACK_IMAGE_URL, "static", 15)
+        except Exception as e:
+            print(f"Error downloading fallback: {e}")
+    return as_upload(_fallback) if _fallback else None
+
+def get_image_stats():
+    stats = dict(metrics)
+    stats["saved_kb"] = (stats["bytes_in"] - stats["bytes_out"]) // 1024
+    return stats
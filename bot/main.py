@@ -1,12 +1,15 @@
-import sqlite3
 import feedparser
 import asyncio
+import functools
+import hashlib
 import os
-import requests
+import time
 from datetime import datetime
+from urllib.parse import urlparse
 from threading import Thread
 from flask import Flask
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -15,7 +18,57 @@ from telegram.ext import (
     ContextTypes,
     filters,
 )
-from utils import get_image, build_caption, download_image, build_full_article, split_message
+from utils import get_image, split_message, clear_article_cache
+from http_client import get_client, close_client
+from http_cache import get_cache_stats
+from hf_client import get_hf_stats
+from images import get_image_stats
+from cache import get_memory_cache_stats, view_cache
+from pipeline import start_pipeline, prepare_entry, PUBLISH_INTERVAL
+from scheduler import FEED_URLS, FEED_TICK, FEED_BASE_INTERVAL, CHANGED, UNCHANGED, ERROR, load_schedules
+from dispatcher import get_dispatcher, DispatchStats, DISPATCH_PROGRESS_INTERVAL
+from db import (
+    init_database,
+    close_db,
+    has_post,
+    save_post,
+    update_post_message_id,
+    increment_share_count,
+    get_stats,
+    get_or_create_user,
+    get_user_profile,
+    get_user_subscriptions,
+    toggle_subscription,
+    get_bookmarks_page,
+    toggle_bookmark,
+    is_bookmarked,
+    get_post,
+    get_post_share_info,
+    get_posts_page,
+    get_category_counts,
+    save_feedback,
+    get_pending_feedback,
+    toggle_notifications,
+    get_notifications_status,
+    log_activity,
+    get_admin_stats,
+    get_feed_state,
+    save_feed_state,
+    get_feed_schedules,
+    save_feed_schedule,
+    get_photo_file_id,
+    save_photo_file_id,
+    forget_photo_file_id,
+    enqueue_broadcast,
+    enqueue_notification,
+    get_pending_outbox,
+    complete_outbox,
+    get_outbox_batch,
+    flush_write_behind,
+    get_write_behind_stats,
+    get_db_executor_stats,
+    WRITE_BEHIND_INTERVAL,
+)
 
 TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 CHANNEL_ID = os.environ.get("TELEGRAM_CHANNEL_ID", "-1003318199741")
@@ -24,349 +77,72 @@ ADMIN_ID = int(os.environ.get("TELEGRAM_ADMIN_ID", "5095434008"))
 
 if not TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN environment variable is required!")
-FEED_URL = "https://wabetainfo.com/feed/"
-CHECK_INTERVAL = 300
-DB_FILE = "posts_history.db"
+FEED_URL = FEED_URLS[0]
+OUTBOX_CHUNK_SIZE = int(os.environ.get("OUTBOX_CHUNK_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", "5"))
 
 CATEGORIES = ["Android", "iOS", "Windows", "Web", "General"]
 
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-
-def init_database():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS posts (
-        id TEXT PRIMARY KEY,
-        title TEXT,
-        link TEXT,
-        published TEXT,
-        share_count INTEGER DEFAULT 0,
-        category TEXT,
-        channel_message_id INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    try:
-        cur.execute("ALTER TABLE posts ADD COLUMN channel_message_id INTEGER")
-    except:
-        pass
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS subscriptions (
-        user_id INTEGER,
-        category TEXT,
-        PRIMARY KEY(user_id, category)
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS post_shares (
-        user_id INTEGER,
-        post_id TEXT,
-        shared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY(user_id, post_id)
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS user_profiles (
-        user_id INTEGER PRIMARY KEY,
-        username TEXT,
-        first_name TEXT,
-        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        notifications_enabled INTEGER DEFAULT 1,
-        language TEXT DEFAULT 'en',
-        last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS bookmarks (
-        user_id INTEGER,
-        post_id TEXT,
-        bookmarked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY(user_id, post_id)
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS feedback (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        message TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        status TEXT DEFAULT 'pending'
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS user_activity (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        action TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    conn.commit()
-    conn.close()
-    print("Database initialized successfully!")
+async def fetch_rss_feed(conditional=True):
+    _, feed, _ = await fetch_feed(FEED_URL, conditional)
+    return feed
 
-def fetch_rss_feed():
+async def fetch_feed(url, conditional=True):
+    etag, last_modified, body_hash = await get_feed_state(url)
+    headers = {}
+    if conditional:
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    
     try:
-        response = requests.get(FEED_URL, headers={"User-Agent": USER_AGENT}, timeout=15)
+        response = await get_client().get(url, headers=headers, timeout=15)
+        if response.status_code == 304:
+            print(f"RSS feed not modified (304): {url}")
+            return UNCHANGED, None, None
         if response.status_code == 200:
-            return feedparser.parse(response.content)
+            # Validators are stored by the caller once every entry has been handled, so an
+            # entry that failed to prepare is retried on the next poll.
+            state = (response.headers.get("etag"), response.headers.get("last-modified"),
+                     hashlib.sha256(response.content).hexdigest())
+            if conditional and state[2] == body_hash:
+                await save_feed_state(url, *state)
+                print(f"RSS feed body unchanged, skipping parse: {url}")
+                return UNCHANGED, None, None
+            return CHANGED, await asyncio.to_thread(feedparser.parse, response.content), state
+        print(f"RSS feed {url} returned status {response.status_code}")
     except Exception as e:
-        print(f"Error fetching RSS feed: {e}")
-    return feedparser.parse(FEED_URL)
-
-def db_connect():
-    return sqlite3.connect(DB_FILE)
-
-def has_post(post_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM posts WHERE id=?", (post_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row is not None
-
-def save_post(post_id, title, link, published, category="General", channel_message_id=None):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT OR IGNORE INTO posts (id, title, link, published, category, channel_message_id)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (post_id, title, link, published, category, channel_message_id))
-    conn.commit()
-    conn.close()
-
-def update_post_message_id(post_id, channel_message_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("UPDATE posts SET channel_message_id=? WHERE id=?", (channel_message_id, post_id))
-    conn.commit()
-    conn.close()
-
-def increment_share_count(post_id, user_id=None):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("UPDATE posts SET share_count = share_count + 1 WHERE id=?", (post_id,))
-    if user_id:
-        cur.execute("INSERT OR IGNORE INTO post_shares (user_id, post_id) VALUES (?, ?)", (user_id, post_id))
-    conn.commit()
-    conn.close()
-
-def get_stats():
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM posts")
-    posts_count = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(DISTINCT user_id) FROM user_profiles")
-    users_count = cur.fetchone()[0]
-    cur.execute("SELECT title, share_count FROM posts ORDER BY share_count DESC LIMIT 5")
-    top_posts = cur.fetchall()
-    conn.close()
-    return posts_count, users_count, top_posts
-
-def get_or_create_user(user_id, username=None, first_name=None):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT user_id FROM user_profiles WHERE user_id=?", (user_id,))
-    row = cur.fetchone()
-    if not row:
-        cur.execute("""
-            INSERT INTO user_profiles (user_id, username, first_name)
-            VALUES (?, ?, ?)
-        """, (user_id, username, first_name))
-        conn.commit()
-    else:
-        cur.execute("UPDATE user_profiles SET last_active=CURRENT_TIMESTAMP WHERE user_id=?", (user_id,))
-        conn.commit()
-    conn.close()
-
-def get_user_profile(user_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM user_profiles WHERE user_id=?", (user_id,))
-    profile = cur.fetchone()
-    cur.execute("SELECT COUNT(*) FROM post_shares WHERE user_id=?", (user_id,))
-    shares = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM bookmarks WHERE user_id=?", (user_id,))
-    bookmarks = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM subscriptions WHERE user_id=?", (user_id,))
-    subs = cur.fetchone()[0]
-    conn.close()
-    return profile, shares, bookmarks, subs
-
-def get_user_subscriptions(user_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT category FROM subscriptions WHERE user_id=?", (user_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows]
-
-def toggle_subscription(user_id, category):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM subscriptions WHERE user_id=? AND category=?", (user_id, category))
-    if cur.fetchone():
-        cur.execute("DELETE FROM subscriptions WHERE user_id=? AND category=?", (user_id, category))
-        result = False
-    else:
-        cur.execute("INSERT INTO subscriptions (user_id, category) VALUES (?, ?)", (user_id, category))
-        result = True
-    conn.commit()
-    conn.close()
-    return result
-
-def get_user_bookmarks(user_id, limit=10, offset=0):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT p.id, p.title, p.link, p.category 
-        FROM bookmarks b 
-        JOIN posts p ON b.post_id = p.id 
-        WHERE b.user_id=? 
-        ORDER BY b.bookmarked_at DESC 
-        LIMIT ? OFFSET ?
-    """, (user_id, limit, offset))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def toggle_bookmark(user_id, post_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM bookmarks WHERE user_id=? AND post_id=?", (user_id, post_id))
-    if cur.fetchone():
-        cur.execute("DELETE FROM bookmarks WHERE user_id=? AND post_id=?", (user_id, post_id))
-        result = False
-    else:
-        cur.execute("INSERT INTO bookmarks (user_id, post_id) VALUES (?, ?)", (user_id, post_id))
-        result = True
-    conn.commit()
-    conn.close()
-    return result
-
-def is_bookmarked(user_id, post_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM bookmarks WHERE user_id=? AND post_id=?", (user_id, post_id))
-    result = cur.fetchone() is not None
-    conn.close()
-    return result
-
-def get_recent_posts(limit=10, offset=0, category=None):
-    conn = db_connect()
-    cur = conn.cursor()
-    if category:
-        cur.execute("""
-            SELECT id, title, link, category, share_count 
-            FROM posts 
-            WHERE category=?
-            ORDER BY rowid DESC 
-            LIMIT ? OFFSET ?
-        """, (category, limit, offset))
-    else:
-        cur.execute("""
-            SELECT id, title, link, category, share_count 
-            FROM posts 
-            ORDER BY rowid DESC 
-            LIMIT ? OFFSET ?
-        """, (limit, offset))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_posts_count(category=None):
-    conn = db_connect()
-    cur = conn.cursor()
-    if category:
-        cur.execute("SELECT COUNT(*) FROM posts WHERE category=?", (category,))
-    else:
-        cur.execute("SELECT COUNT(*) FROM posts")
-    count = cur.fetchone()[0]
-    conn.close()
-    return count
-
-def save_feedback(user_id, message):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO feedback (user_id, message) VALUES (?, ?)", (user_id, message))
-    conn.commit()
-    conn.close()
-
-def get_pending_feedback():
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT id, user_id, message, created_at FROM feedback WHERE status='pending' ORDER BY created_at DESC LIMIT 10")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def toggle_notifications(user_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT notifications_enabled FROM user_profiles WHERE user_id=?", (user_id,))
-    row = cur.fetchone()
-    if row:
-        new_val = 0 if row[0] == 1 else 1
-        cur.execute("UPDATE user_profiles SET notifications_enabled=? WHERE user_id=?", (new_val, user_id))
-        conn.commit()
-        result = new_val == 1
-    else:
-        result = True
-    conn.close()
-    return result
-
-def get_notifications_status(user_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT notifications_enabled FROM user_profiles WHERE user_id=?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row[0] == 1 if row else True
-
-def get_subscribed_users(category):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT s.user_id FROM subscriptions s 
-        JOIN user_profiles u ON s.user_id = u.user_id 
-        WHERE s.category=? AND u.notifications_enabled=1
-    """, (category,))
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows]
-
-def log_activity(user_id, action):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO user_activity (user_id, action) VALUES (?, ?)", (user_id, action))
-    conn.commit()
-    conn.close()
-
-def get_admin_stats():
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM user_profiles")
-    total_users = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM posts")
-    total_posts = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM bookmarks")
-    total_bookmarks = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM post_shares")
-    total_shares = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM feedback WHERE status='pending'")
-    pending_feedback = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM user_activity WHERE created_at >= datetime('now', '-1 day')")
-    daily_activity = cur.fetchone()[0]
-    conn.close()
-    return {
-        "users": total_users,
-        "posts": total_posts,
-        "bookmarks": total_bookmarks,
-        "shares": total_shares,
-        "pending_feedback": pending_feedback,
-        "daily_activity": daily_activity
-    }
+        print(f"Error fetching RSS feed {url}: {e}")
+    return ERROR, None, None
+
+photo_stats = {"uploads": 0, "reused": 0, "stale": 0}
+STALE_FILE_ERRORS = ("wrong file identifier", "file_id", "file_reference")
+
+async def send_channel_photo(bot, image_data, caption):
+    if len(caption) > 1024:
+        caption = caption[:1021] + "..."
+    
+    content_hash = hashlib.sha256(image_data.getvalue()).hexdigest()
+    file_id = await get_photo_file_id(content_hash)
+    if file_id:
+        try:
+            sent_msg = await bot.send_photo(chat_id=CHANNEL_ID, photo=file_id, caption=caption, parse_mode="HTML")
+            photo_stats["reused"] += 1
+            return sent_msg
+        except BadRequest as e:
+            if not any(marker in e.message.lower() for marker in STALE_FILE_ERRORS):
+                raise
+            print(f"Cached photo file_id rejected ({e}), uploading again")
+            photo_stats["stale"] += 1
+            await forget_photo_file_id(content_hash)
+    
+    image_data.seek(0)
+    sent_msg = await bot.send_photo(chat_id=CHANNEL_ID, photo=image_data, caption=caption, parse_mode="HTML")
+    photo_stats["uploads"] += 1
+    if sent_msg.photo:
+        await save_photo_file_id(content_hash, sent_msg.photo[-1].file_id)
+    return sent_msg
 
 flask_app = Flask(__name__)
 
@@ -390,7 +166,7 @@ waiting_for_broadcast = {}
 
 async def start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    get_or_create_user(user.id, user.username, user.first_name)
+    await get_or_create_user(user.id, user.username, user.first_name)
     log_activity(user.id, "start")
     
     welcome_text = f"""
@@ -433,46 +209,50 @@ async def test_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     await update.message.reply_text("Fetching latest post from WABeta News...")
-    
+    context.application.create_task(
+        report_to_admin(context.bot, update.effective_chat.id, publish_latest_post(context.bot))
+    )
+
+# Feed work can take minutes (article fetches, summaries, publish pauses); admin commands run
+# it as a background task so other users' updates are not queued behind it.
+async def report_to_admin(bot, chat_id, job):
     try:
-        feed = fetch_rss_feed()
-        if not feed.entries:
-            await update.message.reply_text("No posts found in the RSS feed.")
-            return
-        
-        latest = feed.entries[0]
-        caption, categories = build_caption(latest)
-        full_article, _ = build_full_article(latest)
-        
-        save_post(
-            latest.id,
-            getattr(latest, "title", ""),
-            getattr(latest, "link", ""),
-            getattr(latest, "published", ""),
-            categories[0] if categories else "General",
-        )
-        
-        image_data = download_image(latest)
-        if image_data:
-            if len(full_article) > 1024:
-                full_article = full_article[:1021] + "..."
-            
-            sent_msg = await context.bot.send_photo(
-                chat_id=CHANNEL_ID,
-                photo=image_data,
-                caption=full_article,
-                parse_mode="HTML",
-            )
-            
-            update_post_message_id(latest.id, sent_msg.message_id)
-            
-            await update.message.reply_text(f"Latest post sent to channel!\n\nTitle: {latest.title}")
-        else:
-            await update.message.reply_text("Could not download image. Please try again.")
+        text = await job
     except Exception as e:
-        await update.message.reply_text(f"Error: {str(e)}")
+        text = f"Error: {str(e)}"
+    await bot.send_message(chat_id=chat_id, text=text)
+
+async def publish_latest_post(bot):
+    clear_article_cache()
+    feed = await fetch_rss_feed(conditional=False)
+    if not feed or not feed.entries:
+        return "No posts found in the RSS feed."
+    
+    latest = feed.entries[0]
+    prepared = await prepare_entry(latest)
+    full_article, categories = prepared.full_article, prepared.categories
+    
+    await save_post(
+        latest.id,
+        getattr(latest, "title", ""),
+        getattr(latest, "link", ""),
+        getattr(latest, "published", ""),
+        categories[0] if categories else "General",
+    )
+    
+    image_data = prepared.image_data
+    if not image_data:
+        return "Could not download image. Please try again."
+    
+    sent_msg = await send_channel_photo(bot, image_data, full_article)
+    await update_post_message_id(latest.id, sent_msg.message_id)
+    return f"Latest post sent to channel!\n\nTitle: {latest.title}"
 
-async def show_main_menu(message_or_query, user_id, edit=False):
+async def refresh_feeds(app):
+    await check_feeds(app, force=True)
+    return "Feed refreshed successfully!"
+
+async def render_main_menu(is_admin):
     menu_text = """
 📱 <b>WABeta News Bot</b>
 
@@ -502,21 +282,19 @@ Choose an option below:
         [InlineKeyboardButton("💬 Send Feedback", callback_data="menu_feedback")],
     ]
     
-    if user_id == ADMIN_ID:
+    if is_admin:
         keyboard.append([InlineKeyboardButton("🔐 Admin Panel", callback_data="admin_panel")])
     
+    return menu_text, InlineKeyboardMarkup(keyboard)
+
+async def show_main_menu(message_or_query, user_id, edit=False):
+    is_admin = user_id == ADMIN_ID
+    menu_text, markup = await view_cache.get(("main_menu", is_admin), functools.partial(render_main_menu, is_admin))
+    
     if edit:
-        await message_or_query.edit_message_text(
-            menu_text, 
-            parse_mode="HTML", 
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        await message_or_query.edit_message_text(menu_text, parse_mode="HTML", reply_markup=markup)
     else:
-        await message_or_query.reply_text(
-            menu_text, 
-            parse_mode="HTML", 
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        await message_or_query.reply_text(menu_text, parse_mode="HTML", reply_markup=markup)
 
 async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -524,7 +302,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     data = query.data
     user_id = query.from_user.id
     
-    get_or_create_user(user_id, query.from_user.username, query.from_user.first_name)
+    await get_or_create_user(user_id, query.from_user.username, query.from_user.first_name)
     
     if data == "main_menu":
         if user_id in waiting_for_feedback:
@@ -543,15 +321,15 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     if data.startswith("news_page_"):
-        page = int(data.split("_")[2])
-        await show_news_menu(query, user_id, page=page)
+        page, before, after = parse_page_cursor(data.split("_")[2:])
+        await show_news_menu(query, user_id, page=page, before=before, after=after)
         return
     
     if data.startswith("news_cat_"):
         parts = data.split("_")
         cat = parts[2]
-        page = int(parts[3]) if len(parts) > 3 else 0
-        await show_category_news(query, user_id, cat, page)
+        page, before, after = parse_page_cursor(parts[3:])
+        await show_category_news(query, user_id, cat, page, before=before, after=after)
         return
     
     if data == "menu_categories":
@@ -567,13 +345,13 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     if data.startswith("bookmarks_page_"):
-        page = int(data.split("_")[2])
-        await show_bookmarks(query, user_id, page=page)
+        page, before, after = parse_page_cursor(data.split("_")[2:])
+        await show_bookmarks(query, user_id, page=page, before=before, after=after)
         return
     
     if data.startswith("bookmark_"):
         post_id = data[9:]
-        added = toggle_bookmark(user_id, post_id)
+        added = await toggle_bookmark(user_id, post_id)
         status = "added to" if added else "removed from"
         await query.answer(f"Post {status} bookmarks!", show_alert=True)
         return
@@ -584,7 +362,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if data.startswith("toggle_sub_"):
         category = data[11:]
-        subscribed = toggle_subscription(user_id, category)
+        subscribed = await toggle_subscription(user_id, category)
         status = "subscribed to" if subscribed else "unsubscribed from"
         await query.answer(f"You {status} {category}!", show_alert=True)
         await show_subscriptions(query, user_id)
@@ -595,7 +373,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     if data == "toggle_notifications":
-        enabled = toggle_notifications(user_id)
+        enabled = await toggle_notifications(user_id)
         status = "enabled" if enabled else "disabled"
         await query.answer(f"Notifications {status}!", show_alert=True)
         await show_settings(query, user_id)
@@ -620,11 +398,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if data.startswith("share_post_"):
         post_id = data[11:]
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT title, link, channel_message_id FROM posts WHERE id=?", (post_id,))
-        post = cur.fetchone()
-        conn.close()
+        post = await get_post_share_info(post_id)
         
         if post:
             title, link, channel_msg_id = post
@@ -636,7 +410,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             share_text = f"📰 {title}\n\n🔗 Read more: {post_link}\n\n📢 Join @{CHANNEL_USERNAME} for more WhatsApp news!"
             
-            increment_share_count(post_id, user_id)
+            await increment_share_count(post_id, user_id)
             
             await query.message.reply_text(
                 f"<b>Share this post:</b>\n\n{share_text}\n\n👆 <i>Forward this message to share with friends!</i>",
@@ -661,11 +435,9 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if data == "admin_refresh" and user_id == ADMIN_ID:
         await query.answer("Refreshing feed...", show_alert=False)
-        try:
-            await process_feed(context.application)
-            await query.answer("Feed refreshed successfully!", show_alert=True)
-        except Exception as e:
-            await query.answer(f"Error: {str(e)[:50]}", show_alert=True)
+        context.application.create_task(
+            report_to_admin(context.bot, query.message.chat_id, refresh_feeds(context.application))
+        )
         return
     
     if data == "admin_test_post" and user_id == ADMIN_ID:
@@ -676,27 +448,42 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await show_broadcast_prompt(query, user_id)
         return
 
-async def show_news_menu(query, user_id, page=0):
-    posts = get_recent_posts(limit=5, offset=page*5)
-    total = get_posts_count()
-    total_pages = max(1, (total + 4) // 5)
+def parse_page_cursor(parts):
+    if len(parts) < 3:
+        return 0, None, None
+    page = int(parts[0])
+    cursor = tuple(int(p) for p in parts[2:])
+    if len(cursor) == 1:
+        cursor = cursor[0]
+    if parts[1] == "n":
+        return page, None, cursor
+    return page, cursor, None
+
+def page_callback(prefix, page, direction, cursor):
+    if isinstance(cursor, tuple):
+        cursor = "_".join(str(c) for c in cursor)
+    return f"{prefix}_{page}_{direction}_{cursor}"
+
+async def show_news_menu(query, user_id, page=0, before=None, after=None):
+    posts, has_more = await get_posts_page(limit=5, before=before, after=after)
+    has_older = has_more if after is None else True
     
     if not posts:
         text = "<b>Latest News</b>\n\nNo posts available yet."
         keyboard = [[InlineKeyboardButton("Back to Menu", callback_data="main_menu")]]
     else:
-        text = f"<b>Latest News</b> (Page {page+1}/{total_pages})\n\n"
+        text = f"<b>Latest News</b> (Page {page+1})\n\n"
         keyboard = []
         for post in posts:
-            post_id, title, link, category, shares = post
+            rowid, post_id, title, link, category, shares = post
             short_title = title[:30] + "..." if len(title) > 30 else title
             keyboard.append([InlineKeyboardButton(f"{short_title}", callback_data=f"view_post_{post_id}")])
         
         nav_buttons = []
         if page > 0:
-            nav_buttons.append(InlineKeyboardButton("Previous", callback_data=f"news_page_{page-1}"))
-        if page < total_pages - 1:
-            nav_buttons.append(InlineKeyboardButton("Next", callback_data=f"news_page_{page+1}"))
+            nav_buttons.append(InlineKeyboardButton("Previous", callback_data=page_callback("news_page", page-1, "n", posts[0][0])))
+        if has_older:
+            nav_buttons.append(InlineKeyboardButton("Next", callback_data=page_callback("news_page", page+1, "o", posts[-1][0])))
         if nav_buttons:
             keyboard.append(nav_buttons)
         
@@ -704,37 +491,41 @@ async def show_news_menu(query, user_id, page=0):
     
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
-async def show_categories_menu(query):
+async def render_categories_menu():
     text = "<b>Browse by Category</b>\n\nSelect a category to view posts:"
     keyboard = []
+    counts = await get_category_counts()
     for cat in CATEGORIES:
-        count = get_posts_count(cat)
+        count = counts.get(cat, 0)
         keyboard.append([InlineKeyboardButton(f"{cat} ({count} posts)", callback_data=f"news_cat_{cat}_0")])
     keyboard.append([InlineKeyboardButton("Back to Menu", callback_data="main_menu")])
     
-    await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
+    return text, InlineKeyboardMarkup(keyboard)
 
-async def show_category_news(query, user_id, category, page=0):
-    posts = get_recent_posts(limit=5, offset=page*5, category=category)
-    total = get_posts_count(category)
-    total_pages = max(1, (total + 4) // 5)
+async def show_categories_menu(query):
+    text, markup = await view_cache.get("categories", render_categories_menu)
+    await query.edit_message_text(text, parse_mode="HTML", reply_markup=markup)
+
+async def show_category_news(query, user_id, category, page=0, before=None, after=None):
+    posts, has_more = await get_posts_page(limit=5, category=category, before=before, after=after)
+    has_older = has_more if after is None else True
     
     if not posts:
         text = f"<b>{category} News</b>\n\nNo posts in this category yet."
     else:
-        text = f"<b>{category} News</b> (Page {page+1}/{total_pages})\n\n"
+        text = f"<b>{category} News</b> (Page {page+1})\n\n"
     
     keyboard = []
     for post in posts:
-        post_id, title, link, cat, shares = post
+        rowid, post_id, title, link, cat, shares = post
         short_title = title[:30] + "..." if len(title) > 30 else title
         keyboard.append([InlineKeyboardButton(f"{short_title}", callback_data=f"view_post_{post_id}")])
     
     nav_buttons = []
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton("Previous", callback_data=f"news_cat_{category}_{page-1}"))
-    if page < total_pages - 1:
-        nav_buttons.append(InlineKeyboardButton("Next", callback_data=f"news_cat_{category}_{page+1}"))
+    if posts and page > 0:
+        nav_buttons.append(InlineKeyboardButton("Previous", callback_data=page_callback(f"news_cat_{category}", page-1, "n", posts[0][0])))
+    if posts and has_older:
+        nav_buttons.append(InlineKeyboardButton("Next", callback_data=page_callback(f"news_cat_{category}", page+1, "o", posts[-1][0])))
     if nav_buttons:
         keyboard.append(nav_buttons)
     
@@ -744,7 +535,7 @@ async def show_category_news(query, user_id, category, page=0):
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def show_profile(query, user_id):
-    profile, shares, bookmarks, subs = get_user_profile(user_id)
+    profile, shares, bookmarks, subs = await get_user_profile(user_id)
     
     if profile:
         username = profile[1] or "Not set"
@@ -774,8 +565,9 @@ async def show_profile(query, user_id):
     keyboard = [[InlineKeyboardButton("Back to Menu", callback_data="main_menu")]]
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
-async def show_bookmarks(query, user_id, page=0):
-    bookmarks = get_user_bookmarks(user_id, limit=5, offset=page*5)
+async def show_bookmarks(query, user_id, page=0, before=None, after=None):
+    bookmarks, has_more = await get_bookmarks_page(user_id, limit=5, before=before, after=after)
+    has_older = has_more if after is None else True
     
     if not bookmarks:
         text = "<b>🔖 Your Bookmarks</b>\n\nNo bookmarks yet. Browse news to save articles!"
@@ -784,16 +576,24 @@ async def show_bookmarks(query, user_id, page=0):
         text = f"<b>🔖 Your Bookmarks</b>\n\n"
         keyboard = []
         for bm in bookmarks:
-            post_id, title, link, category = bm
+            bookmarked_ts, bookmark_rowid, post_id, title, link, category = bm
             short_title = title[:30] + "..." if len(title) > 30 else title
             keyboard.append([InlineKeyboardButton(f"{short_title}", callback_data=f"view_post_{post_id}")])
         
+        nav_buttons = []
+        if page > 0:
+            nav_buttons.append(InlineKeyboardButton("Previous", callback_data=page_callback("bookmarks_page", page-1, "n", tuple(bookmarks[0][:2]))))
+        if has_older:
+            nav_buttons.append(InlineKeyboardButton("Next", callback_data=page_callback("bookmarks_page", page+1, "o", tuple(bookmarks[-1][:2]))))
+        if nav_buttons:
+            keyboard.append(nav_buttons)
+        
         keyboard.append([InlineKeyboardButton("Back to Menu", callback_data="main_menu")])
     
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def show_subscriptions(query, user_id):
-    subs = get_user_subscriptions(user_id)
+    subs = await get_user_subscriptions(user_id)
     
     text = """
 🔔 <b>Subscriptions</b>
@@ -813,7 +613,7 @@ Toggle categories to receive notifications for new posts:
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def show_settings(query, user_id):
-    notifications = get_notifications_status(user_id)
+    notifications = await get_notifications_status(user_id)
     notif_status = "🔔 ON" if notifications else "🔕 OFF"
     
     text = f"""
@@ -831,8 +631,8 @@ async def show_settings(query, user_id):
     
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
-async def show_channel_stats(query):
-    posts, users, top_posts = get_stats()
+async def render_channel_stats():
+    posts, users, top_posts = await get_stats()
     
     text = f"""
 📊 <b>Channel Statistics</b>
@@ -852,9 +652,13 @@ async def show_channel_stats(query):
         text += f"\n{i}. {short_title} ({shares} shares)"
     
     keyboard = [[InlineKeyboardButton("Back to Menu", callback_data="main_menu")]]
-    await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
+    return text, InlineKeyboardMarkup(keyboard)
 
-async def show_about(query):
+async def show_channel_stats(query):
+    text, markup = await view_cache.get("stats", render_channel_stats)
+    await query.edit_message_text(text, parse_mode="HTML", reply_markup=markup)
+
+async def render_about():
     text = """
 ℹ️ <b>About WABeta News Bot</b>
 
@@ -878,7 +682,11 @@ async def show_about(query):
 """
     
     keyboard = [[InlineKeyboardButton("Back to Menu", callback_data="main_menu")]]
-    await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
+    return text, InlineKeyboardMarkup(keyboard)
+
+async def show_about(query):
+    text, markup = await view_cache.get("about", render_about)
+    await query.edit_message_text(text, parse_mode="HTML", reply_markup=markup)
 
 async def show_feedback_prompt(query, user_id):
     waiting_for_feedback[user_id] = True
@@ -898,18 +706,14 @@ We appreciate your input!
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def show_post_detail(query, user_id, post_id):
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT id, title, link, category, share_count FROM posts WHERE id=?", (post_id,))
-    post = cur.fetchone()
-    conn.close()
+    post = await get_post(post_id)
     
     if not post:
         await query.answer("Post not found!", show_alert=True)
         return
     
     pid, title, link, category, shares = post
-    bookmarked = is_bookmarked(user_id, post_id)
+    bookmarked = await is_bookmarked(user_id, post_id)
     bm_text = "❌ Remove Bookmark" if bookmarked else "🔖 Bookmark"
     
     text = f"""
@@ -936,7 +740,32 @@ async def show_post_detail(query, user_id, post_id):
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def show_admin_panel(query):
-    stats = get_admin_stats()
+    stats = await get_admin_stats()
+    cache = get_cache_stats()
+    buffer = get_write_behind_stats()
+    memory = get_memory_cache_stats()
+    views = view_cache.stats()
+    hf = get_hf_stats()
+    images = get_image_stats()
+    breaker = f"{hf['state']} ({hf['trips']} trips)"
+    if hf['state'] == "open":
+        breaker += f", retry in {hf['retry_in']:.0f}s"
+    db_stats = get_db_executor_stats()
+    db_lines = "\n".join(
+        f"• {name}: {e['calls']} calls, wait {e['wait_ms_avg']:.1f}/{e['wait_ms_max']:.0f} ms, "
+        f"exec {e['exec_ms_avg']:.1f}/{e['exec_ms_max']:.0f} ms (avg/max), {e['in_flight']} in flight"
+        for name, e in db_stats.items()
+    )
+    now = time.time()
+    feed_lines = "\n".join(
+        f"• {urlparse(s.url).netloc}: every {s.interval / 60:.0f} min, next in {max(0, s.next_due - now) / 60:.0f} min"
+        + (f", {s.failures} failures" if s.failures else "")
+        for s in load_schedules(await get_feed_schedules())
+    )
+    memory_lines = "\n".join(
+        f"• {name}: {c['size']} cached, {c['hits']} hits / {c['misses']} misses"
+        for name, c in memory.items()
+    )
     
     text = f"""
 🔐 <b>Admin Panel</b>
@@ -952,6 +781,58 @@ async def show_admin_panel(query):
 💬 Pending Feedback: {stats['pending_feedback']}
 📈 Daily Activity: {stats['daily_activity']}
 
+━━━━━━━━━━━━━━━
+📡 <b>Feeds:</b>
+━━━━━━━━━━━━━━━
+
+{feed_lines}
+
+━━━━━━━━━━━━━━━
+🗄 <b>HTTP Cache:</b>
+━━━━━━━━━━━━━━━
+
+✅ Hits: {cache['hits']} | ❌ Misses: {cache['misses']}
+🔁 Revalidated: {cache['revalidated']} | 🧹 Evicted: {cache['evictions']}
+💾 Entries: {cache['entries']} ({cache['bytes'] // 1024} KB) | ✂️ Truncated: {cache['truncated']}
+
+━━━━━━━━━━━━━━━
+✍️ <b>Write-behind:</b>
+━━━━━━━━━━━━━━━
+
+⏳ Pending: {buffer['pending']} | 🔀 Coalesced: {buffer['coalesced']}
+💾 Flushes: {buffer['flushes']} ({buffer['rows_written']} rows, last {buffer['last_flush_ms']:.1f} ms)
+⚠️ Dropped: {buffer['dropped']} | Late: {buffer['late_flushes']} | Failed: {buffer['failed_flushes']}
+
+━━━━━━━━━━━━━━━
+🧠 <b>Memory Caches:</b>
+━━━━━━━━━━━━━━━
+
+{memory_lines}
+• views: {views['size']} cached, {views['hits']} hits / {views['renders']} renders
+
+━━━━━━━━━━━━━━━
+🖼 <b>Images:</b>
+━━━━━━━━━━━━━━━
+
+⬇️ Downloads: {images['downloads']} | ♻️ Recompressed: {images['recompressed']} | ⛔ Rejected: {images['rejected']}
+💾 Saved: {images['saved_kb']} KB
+📤 Uploads: {photo_stats['uploads']} | 🔁 Reused file_id: {photo_stats['reused']} | ⚠️ Stale: {photo_stats['stale']}
+
+━━━━━━━━━━━━━━━
+🤗 <b>HuggingFace:</b>
+━━━━━━━━━━━━━━━
+
+🔌 Breaker: {breaker}
+⏱ Latency: last {hf['last_ms']:.0f} ms, avg {hf['avg_ms']:.0f} ms
+📦 Batches: {hf['batching']['batches']} (avg {hf['batching']['avg_batch']:.1f} items, {hf['batching']['fallbacks']} per-item fallbacks)
+✅ {hf['successes']} ok | ❌ {hf['failures']} failed | ⌛ {hf['timeouts']} timeouts | 💤 {hf['loading']} loading | ⏭ {hf['skipped']} skipped
+
+━━━━━━━━━━━━━━━
+🗃 <b>Database Threads:</b>
+━━━━━━━━━━━━━━━
+
+{db_lines}
+
 ━━━━━━━━━━━━━━━
 """
     
@@ -966,7 +847,7 @@ async def show_admin_panel(query):
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def show_admin_feedback(query):
-    feedback = get_pending_feedback()
+    feedback = await get_pending_feedback()
     
     if not feedback:
         text = "<b>💬 Feedback</b>\n\nNo pending feedback."
@@ -982,7 +863,7 @@ async def show_admin_feedback(query):
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
 
 async def show_admin_users(query):
-    stats = get_admin_stats()
+    stats = await get_admin_stats()
     text = f"<b>👥 User Statistics</b>\n\nTotal Users: {stats['users']}"
     keyboard = [[InlineKeyboardButton("Back to Admin", callback_data="admin_panel")]]
     await query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(keyboard))
@@ -1006,42 +887,9 @@ It will be sent to all users with notifications enabled.
 
 async def admin_send_test_post(query, context):
     await query.answer("Sending test post to channel...", show_alert=False)
-    
-    try:
-        feed = fetch_rss_feed()
-        if not feed.entries:
-            await query.answer("No posts found in feed!", show_alert=True)
-            return
-        
-        latest = feed.entries[0]
-        full_article, categories = build_full_article(latest)
-        
-        save_post(
-            latest.id,
-            getattr(latest, "title", ""),
-            getattr(latest, "link", ""),
-            getattr(latest, "published", ""),
-            categories[0] if categories else "General",
-        )
-        
-        image_data = download_image(latest)
-        if image_data:
-            if len(full_article) > 1024:
-                full_article = full_article[:1021] + "..."
-            
-            sent_msg = await context.bot.send_photo(
-                chat_id=CHANNEL_ID,
-                photo=image_data,
-                caption=full_article,
-                parse_mode="HTML",
-            )
-            
-            update_post_message_id(latest.id, sent_msg.message_id)
-            await query.answer("Test post sent successfully!", show_alert=True)
-        else:
-            await query.answer("Failed to download image!", show_alert=True)
-    except Exception as e:
-        await query.answer(f"Error: {str(e)[:50]}", show_alert=True)
+    context.application.create_task(
+        report_to_admin(context.bot, query.message.chat_id, publish_latest_post(context.bot))
+    )
 
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
@@ -1049,7 +897,7 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if user_id in waiting_for_feedback:
         del waiting_for_feedback[user_id]
-        save_feedback(user_id, text)
+        await save_feedback(user_id, text)
         await update.message.reply_text(
             "✅ Thank you for your feedback! We appreciate it.",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("Back to Menu", callback_data="main_menu")]])
@@ -1059,91 +907,183 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if user_id in waiting_for_broadcast and user_id == ADMIN_ID:
         del waiting_for_broadcast[user_id]
         
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT user_id FROM user_profiles WHERE notifications_enabled=1")
-        users = [r[0] for r in cur.fetchall()]
-        conn.close()
-        
-        sent = 0
-        for uid in users:
-            try:
-                await context.bot.send_message(
-                    chat_id=uid,
-                    text=f"📢 <b>Broadcast Message</b>\n\n{text}",
-                    parse_mode="HTML"
-                )
-                sent += 1
-            except:
-                pass
-        
-        await update.message.reply_text(
-            f"✅ Broadcast sent to {sent} users!",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("Back to Admin", callback_data="admin_panel")]])
+        # The report message must exist before the batch does, or the outbox worker may drain
+        # a small broadcast before it knows where to report.
+        progress_msg = await update.message.reply_text("📢 Broadcast queued...")
+        _, total = await enqueue_broadcast(
+            f"📢 <b>Broadcast Message</b>\n\n{text}", user_id, progress_msg.message_id
         )
+        if total:
+            wake_outbox()
+        else:
+            await progress_msg.edit_text("📢 No users to broadcast to.")
         return
 
-async def process_feed(app):
-    print("Processing RSS feed...")
-    feed = fetch_rss_feed()
-    
-    if not feed.entries:
-        print("No entries in feed")
-        return
-    
-    for entry in feed.entries[:5]:
-        post_id = entry.id
-        
-        if has_post(post_id):
+async def process_feed(app, url=FEED_URL):
+    print(f"Processing RSS feed {url}...")
+    clear_article_cache()
+    outcome, feed, state = await fetch_feed(url)
+    
+    if not feed or not feed.entries:
+        print("No new entries in feed")
+        return ERROR if outcome == ERROR or (feed is not None and feed.bozo) else UNCHANGED
+    
+    seen = await asyncio.gather(*[has_post(entry.id) for entry in feed.entries[:5]])
+    new_entries = [entry for entry, exists in zip(feed.entries[:5], seen) if not exists]
+    if not new_entries:
+        await save_feed_state(url, *state)
+        return UNCHANGED
+    
+    published = 0
+    failed = 0
+    deadline = time.monotonic() + FEED_BASE_INTERVAL * 0.5
+    for entry, task in start_pipeline(new_entries, deadline=deadline):
+        try:
+            prepared = await task
+        except Exception as e:
+            print(f"Error preparing {getattr(entry, 'title', entry.id)}: {e}")
+            failed += 1
             continue
         
-        print(f"New post found: {entry.title}")
-        
-        full_article, categories = build_full_article(entry)
-        main_cat = categories[0] if categories else "General"
+        print(f"New post found: {prepared.title}")
         
-        save_post(
-            post_id,
-            getattr(entry, "title", ""),
+        # The has_post check above is far behind us; only the run that inserts the row publishes it.
+        saved = await save_post(
+            prepared.post_id,
+            prepared.title,
             getattr(entry, "link", ""),
             getattr(entry, "published", ""),
-            main_cat,
+            prepared.main_cat,
         )
+        if not saved:
+            print(f"Already published by another run: {prepared.title}")
+            continue
         
         if app:
+            if published:
+                await asyncio.sleep(PUBLISH_INTERVAL)
             try:
-                image_data = download_image(entry)
-                if image_data:
-                    if len(full_article) > 1024:
-                        full_article = full_article[:1021] + "..."
-                    
-                    sent_msg = await app.bot.send_photo(
-                        chat_id=CHANNEL_ID,
-                        photo=image_data,
-                        caption=full_article,
-                        parse_mode="HTML",
-                    )
+                if prepared.image_data:
+                    sent_msg = await send_channel_photo(app.bot, prepared.image_data, prepared.full_article)
+                    published += 1
                     
-                    update_post_message_id(post_id, sent_msg.message_id)
-                    print(f"Posted to channel: {entry.title}")
+                    await update_post_message_id(prepared.post_id, sent_msg.message_id)
+                    print(f"Posted to channel: {prepared.title}")
                     
-                    subscribed = get_subscribed_users(main_cat)
-                    for uid in subscribed:
-                        try:
-                            await app.bot.send_message(
-                                chat_id=uid,
-                                text=f"🔔 New {main_cat} post!\n\n📰 {entry.title}\n\n👆 Check the channel for details!",
-                                parse_mode="HTML"
-                            )
-                        except:
-                            pass
+                    _, queued = await enqueue_notification(
+                        prepared.main_cat,
+                        f"🔔 New {prepared.main_cat} post!\n\n📰 {prepared.title}\n\n👆 Check the channel for details!",
+                    )
+                    if queued:
+                        print(f"Queued {queued} subscriber notifications")
+                        wake_outbox()
             except Exception as e:
                 print(f"Error posting to channel: {e}")
-        
-        await asyncio.sleep(2)
+    if not failed:
+        await save_feed_state(url, *state)
+    return CHANGED
+
+async def check_feeds(app, force=False):
+    now = time.time()
+    for schedule in load_schedules(await get_feed_schedules()):
+        if not force and not schedule.is_due(now):
+            continue
+        try:
+            outcome = await process_feed(app, schedule.url)
+        except Exception as e:
+            print(f"Error processing feed {schedule.url}: {e}")
+            outcome = ERROR
+        try:
+            schedule.record(outcome, time.time())
+            await save_feed_schedule(
+                schedule.url, schedule.next_due, schedule.interval, schedule.failures, schedule.last_change
+            )
+            print(f"Feed {schedule.url}: {outcome}, next check in {schedule.next_due - time.time():.0f}s")
+        except Exception as e:
+            print(f"Error scheduling feed {schedule.url}: {e}")
+
+async def feed_tick_job(context: ContextTypes.DEFAULT_TYPE):
+    await check_feeds(context.application)
+
+async def write_behind_job(context: ContextTypes.DEFAULT_TYPE):
+    await flush_write_behind()
+
+outbox_wakeup = None
+outbox_task = None
+
+def wake_outbox():
+    if outbox_wakeup:
+        outbox_wakeup.set()
+
+async def report_outbox_progress(bot, batch_id, stats):
+    batch = await get_outbox_batch(batch_id)
+    if not batch:
+        return
+    kind, total, sent, failed, report_chat_id, report_message_id, finished_at = batch
+    if not report_chat_id or not report_message_id:
+        return
+    stats.total = total
+    progress = f"{sent}/{total} sent, {failed} failed, {stats.retried} retries, {stats.rate:.1f} msg/s"
+    if finished_at:
+        text = f"✅ Broadcast sent to {sent} users!\n\n{progress}"
+        markup = InlineKeyboardMarkup([[InlineKeyboardButton("Back to Admin", callback_data="admin_panel")]])
+    else:
+        text = f"📢 Broadcasting...\n\n{progress}"
+        markup = None
+    try:
+        await bot.edit_message_text(text, chat_id=report_chat_id, message_id=report_message_id, reply_markup=markup)
+    except Exception as e:
+        print(f"Error reporting broadcast progress: {e}")
+
+async def outbox_worker(app):
+    dispatcher = get_dispatcher(app.bot)
+    batch_stats = {}
+    last_report = {}
+    while True:
+        try:
+            rows = await get_pending_outbox(OUTBOX_CHUNK_SIZE)
+            if not rows:
+                outbox_wakeup.clear()
+                try:
+                    await asyncio.wait_for(outbox_wakeup.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            messages = []
+            for row_id, batch_id, chat_id, text, parse_mode in rows:
+                if batch_id not in batch_stats:
+                    batch_stats[batch_id] = DispatchStats(0)
+                messages.append((chat_id, text, parse_mode, batch_stats[batch_id]))
+            results = await dispatcher.send_all(messages)
+            await complete_outbox([(row[0], row[1], ok) for row, ok in zip(rows, results)])
+            
+            now = time.monotonic()
+            for batch_id in {row[1] for row in rows}:
+                finished = (await get_outbox_batch(batch_id))[6] is not None
+                if finished or now - last_report.get(batch_id, 0) >= DISPATCH_PROGRESS_INTERVAL:
+                    last_report[batch_id] = now
+                    await report_outbox_progress(app.bot, batch_id, batch_stats[batch_id])
+                if finished:
+                    print(f"Outbox batch {batch_id} finished: {batch_stats[batch_id].summary()}")
+                    batch_stats.pop(batch_id, None)
+                    last_report.pop(batch_id, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Outbox worker error: {e}")
+            await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+async def on_startup(app):
+    global outbox_wakeup, outbox_task
+    outbox_wakeup = asyncio.Event()
+    outbox_task = asyncio.create_task(outbox_worker(app))
 
-async def feed_check_job(context: ContextTypes.DEFAULT_TYPE):
-    await process_feed(context.application)
+async def on_shutdown(app):
+    if outbox_task:
+        outbox_task.cancel()
+    await close_client()
+    close_db()
 
 def main():
     print("Initializing database...")
@@ -1154,7 +1094,7 @@ def main():
     
     print(f"Starting bot with token: {TOKEN[:20]}...")
     
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = ApplicationBuilder().token(TOKEN).post_init(on_startup).post_shutdown(on_shutdown).build()
     
     app.add_handler(CommandHandler("start", start_cmd))
     app.add_handler(CommandHandler("menu", panel_cmd))
@@ -1164,7 +1104,8 @@ def main():
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
     
     job_queue = app.job_queue
-    job_queue.run_repeating(feed_check_job, interval=CHECK_INTERVAL, first=10)
+    job_queue.run_repeating(feed_tick_job, interval=FEED_TICK, first=10)
+    job_queue.run_repeating(write_behind_job, interval=WRITE_BEHIND_INTERVAL, first=WRITE_BEHIND_INTERVAL)
     
     print("Bot is running...")
     app.run_polling(drop_pending_updates=True)
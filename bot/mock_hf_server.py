@@ -0,0 +1,64 @@
+import os
+import re
+import time
+from flask import Flask, jsonify, request
+
+mock_app = Flask(__name__)
+
+state = {
+    "mode": os.environ.get("MOCK_HF_MODE", "ok"),
+    "delay": float(os.environ.get("MOCK_HF_DELAY", "30")),
+    "requests": 0,
+}
+
+MODES = ("ok", "loading", "slow", "error", "partial")
+
+def fake_summary(text, max_length):
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    words = []
+    for sentence in sentences:
+        words.extend(sentence.split())
+        if len(words) >= max_length:
+            break
+    return ' '.join(words[:max_length])
+
+@mock_app.route("/models/<path:model>", methods=["POST"])
+def inference(model):
+    state["requests"] += 1
+    payload = request.get_json(silent=True) or {}
+    inputs = payload.get("inputs", "")
+    mode = state["mode"]
+
+    if mode == "loading":
+        return jsonify({
+            "error": f"Model {model} is currently loading",
+            "estimated_time": 20.0,
+        }), 503
+    if mode == "error":
+        return jsonify({"error": "Internal Server Error"}), 500
+    if mode == "slow":
+        time.sleep(state["delay"])
+    if not inputs:
+        return jsonify({"error": "No inputs provided"}), 400
+
+    max_length = payload.get("parameters", {}).get("max_length", 142)
+    if isinstance(inputs, str):
+        return jsonify([{"summary_text": fake_summary(inputs, max_length)}])
+    results = [{"summary_text": fake_summary(text, max_length)} for text in inputs]
+    if mode == "partial":
+        results = results[:len(results) // 2]
+    return jsonify(results)
+
+@mock_app.route("/mode/<mode>", methods=["POST"])
+def set_mode(mode):
+    if mode not in MODES:
+        return jsonify({"error": f"Unknown mode {mode}", "modes": MODES}), 400
+    state["mode"] = mode
+    return jsonify(state)
+
+@mock_app.route("/state")
+def get_state():
+    return jsonify(state)
+
+if __name__ == "__main__":
+    mock_app.run(host="127.0.0.1", port=int(os.environ.get("MOCK_HF_PORT", 5001)), threaded=True)
@@ -0,0 +1,107 @@
+import os
+import asyncio
+import calendar
+from utils import (
+    get_article_document,
+    summarize_text,
+    download_image,
+    get_description,
+    get_category_emoji,
+    format_full_article_with_emojis,
+    caption_budget,
+    clean_brand_text,
+    summary_key,
+    caption_key,
+    SUMMARY_MODE,
+)
+from db import get_summary, save_summary
+
+FETCH_CONCURRENCY = int(os.environ.get("PIPELINE_FETCH_CONCURRENCY", "4"))
+EXTRACT_CONCURRENCY = int(os.environ.get("PIPELINE_EXTRACT_CONCURRENCY", "2"))
+SUMMARIZE_CONCURRENCY = int(os.environ.get("PIPELINE_SUMMARIZE_CONCURRENCY", "4"))
+IMAGE_CONCURRENCY = int(os.environ.get("PIPELINE_IMAGE_CONCURRENCY", "4"))
+PUBLISH_INTERVAL = float(os.environ.get("PIPELINE_PUBLISH_INTERVAL", "2"))
+
+class StageLimits:
+    def __init__(self, fetch=FETCH_CONCURRENCY, extract=EXTRACT_CONCURRENCY,
+                 summarize=SUMMARIZE_CONCURRENCY, image=IMAGE_CONCURRENCY):
+        self.fetch = asyncio.Semaphore(fetch)
+        self.extract = asyncio.Semaphore(extract)
+        self.summarize = asyncio.Semaphore(summarize)
+        self.image = asyncio.Semaphore(image)
+
+class PreparedPost:
+    def __init__(self, entry, full_article, categories, image_data):
+        self.entry = entry
+        self.post_id = entry.id
+        self.title = getattr(entry, "title", "")
+        self.full_article = full_article
+        self.categories = categories
+        self.main_cat = categories[0] if categories else "General"
+        self.image_data = image_data
+
+def publish_order(entries):
+    def key(item):
+        index, entry = item
+        published = entry.get("published_parsed")
+        timestamp = calendar.timegm(published) if published else 0
+        return (timestamp, -index)
+    return [entry for _, entry in sorted(enumerate(entries), key=key)]
+
+async def _summarize(content_hash, article_content, max_chars, limits, deadline):
+    cached = await get_summary(content_hash)
+    if cached:
+        return cached + (SUMMARY_MODE,)
+    async with limits.summarize:
+        summary, mode = await summarize_text(article_content, max_chars=max_chars, deadline=deadline)
+        return summary, None, None, mode
+
+async def _prepare_image(entry, limits):
+    async with limits.image:
+        return await download_image(entry)
+
+async def prepare_entry(entry, limits=None, deadline=None):
+    limits = limits or StageLimits()
+    title = clean_brand_text(getattr(entry, "title", "WhatsApp Update"))
+    link = getattr(entry, "link", "")
+
+    categories = []
+    if hasattr(entry, "tags"):
+        categories = [tag.term for tag in entry.tags if hasattr(tag, 'term')]
+
+    _, main_cat = get_category_emoji(categories)
+
+    article_content = ""
+    if link:
+        async with limits.fetch:
+            doc = await get_article_document(link)
+        async with limits.extract:
+            article_content = await asyncio.to_thread(lambda: doc.paragraph_text)
+
+    if not article_content:
+        summary = get_description(entry)
+        image_data = await _prepare_image(entry, limits)
+        full_article = format_full_article_with_emojis(title, summary, link, categories, main_cat)
+        return PreparedPost(entry, full_article, categories, image_data)
+
+    max_chars = caption_budget(title, categories, main_cat)
+    content_hash = summary_key(article_content, max_chars)
+    (summary, cached_key, cached_caption, mode), image_data = await asyncio.gather(
+        _summarize(content_hash, article_content, max_chars, limits, deadline),
+        _prepare_image(entry, limits),
+    )
+
+    key = caption_key(title, link, categories)
+    if cached_key == key:
+        full_article = cached_caption
+    else:
+        full_article = format_full_article_with_emojis(title, summary, link, categories, main_cat)
+        # A local fallback must not be cached under the HF key, or HF would never be retried for this article.
+        if mode == SUMMARY_MODE:
+            await save_summary(content_hash, link, article_content, summary, key, full_article)
+    return PreparedPost(entry, full_article, categories, image_data)
+
+def start_pipeline(entries, limits=None, deadline=None):
+    limits = limits or StageLimits()
+    ordered = publish_order(entries)
+    return [(entry, asyncio.create_task(prepare_entry(entry, limits, deadline))) for entry in ordered]
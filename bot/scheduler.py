@@ -0,0 +1,52 @@
+import os
+import random
+
+FEED_URLS = [url.strip() for url in os.environ.get("FEED_URLS", "https://wabetainfo.com/feed/").split(",") if url.strip()]
+FEED_TICK = float(os.environ.get("FEED_TICK", "30"))
+FEED_MIN_INTERVAL = float(os.environ.get("FEED_MIN_INTERVAL", "120"))
+FEED_BASE_INTERVAL = float(os.environ.get("FEED_BASE_INTERVAL", "300"))
+FEED_MAX_INTERVAL = float(os.environ.get("FEED_MAX_INTERVAL", "3600"))
+FEED_IDLE_BACKOFF = float(os.environ.get("FEED_IDLE_BACKOFF", "1.5"))
+FEED_ACTIVE_WINDOW = float(os.environ.get("FEED_ACTIVE_WINDOW", str(2 * 60 * 60)))
+FEED_JITTER = float(os.environ.get("FEED_JITTER", "0.1"))
+
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+ERROR = "error"
+
+class FeedSchedule:
+    def __init__(self, url, next_due=0.0, interval=FEED_BASE_INTERVAL, failures=0, last_change=None):
+        self.url = url
+        self.next_due = next_due or 0.0
+        self.interval = interval or FEED_BASE_INTERVAL
+        self.failures = failures or 0
+        self.last_change = last_change
+
+    def is_due(self, now):
+        return self.next_due <= now
+
+    def record(self, outcome, now, rng=random):
+        if outcome == ERROR:
+            self.failures += 1
+            interval = FEED_BASE_INTERVAL * 2 ** min(self.failures, 10)
+        else:
+            # The stored interval is an error backoff until the first good poll; grow from the base instead.
+            previous = FEED_BASE_INTERVAL if self.failures else self.interval
+            self.failures = 0
+            if outcome == CHANGED:
+                self.last_change = now
+                interval = FEED_MIN_INTERVAL
+            else:
+                interval = previous * FEED_IDLE_BACKOFF
+                # A feed that published recently tends to publish again soon; keep watching it closely.
+                if self.last_change is not None and now - self.last_change < FEED_ACTIVE_WINDOW:
+                    interval = min(interval, FEED_BASE_INTERVAL)
+        self.interval = max(FEED_MIN_INTERVAL, min(interval, FEED_MAX_INTERVAL))
+        # Jitter keeps feeds sharing a host from settling into lockstep.
+        self.next_due = now + self.interval * rng.uniform(1 - FEED_JITTER, 1 + FEED_JITTER)
+        return self
+
+# Rows are (url, next_due, poll_interval, failures, last_change) as stored in feed_state.
+def load_schedules(rows, urls=None):
+    stored = {row[0]: row for row in rows}
+    return [FeedSchedule(*stored[url]) if url in stored else FeedSchedule(url) for url in (urls or FEED_URLS)]
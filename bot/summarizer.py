@@ -0,0 +1,154 @@
+import os
+import re
+from bisect import bisect_right
+from itertools import accumulate
+import numpy as np
+
+SUMMARIZER_VERSION = 2
+SUMMARY_MAX_CHARS = int(os.environ.get("SUMMARY_MAX_CHARS", "700"))
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
+LEAD_BIAS = 0.15
+REDUNDANCY_THRESHOLD = 0.8
+KEYWORD_WEIGHT = 0.05
+
+SKIP_PHRASES = ('click here', 'subscribe', 'follow us', 'read more', 'advertisement')
+
+KEYWORDS = (
+    'new', 'update', 'feature', 'fix', 'bug', 'add', 'remove', 'change', 'improve', 'support',
+    'enable', 'disable', 'option', 'setting', 'version', 'beta', 'stable', 'release', 'whatsapp',
+    'android', 'ios', 'now', 'can', 'will', 'allow', 'introduce',
+)
+
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been before being but by can could did do does
+for from had has have he her his how i if in into is it its just may more most my no not of on
+one or our out over she so some such than that the their them then there these they this to too
+up us was we were what when where which while who will with would you your
+""".split())
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_WORD = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+_SKIP = re.compile("|".join(map(re.escape, SKIP_PHRASES)))
+
+class SentenceModel:
+    def __init__(self, text):
+        self.text = text or ""
+        self.sentences = [sentence.strip() for sentence in _SENTENCE_SPLIT.split(self.text.strip())]
+        self.lowered = [sentence.lower() for sentence in self.sentences]
+        self._keyword_scores = None
+        self._skipped = None
+
+    def _scan(self):
+        # Substring tests on the once-lowered sentences beat a keyword alternation regex in
+        # CPython; skip phrases are rare, so one pass over the whole text finds them.
+        self._keyword_scores = [sum(1 for word in KEYWORDS if word in sentence) for sentence in self.lowered]
+        joined = "\n".join(self.lowered)
+        starts = [0, *accumulate(len(sentence) + 1 for sentence in self.lowered)]
+        skipped = [False] * len(self.sentences)
+        for match in _SKIP.finditer(joined):
+            skipped[bisect_right(starts, match.start()) - 1] = True
+        self._skipped = skipped
+
+    @property
+    def keyword_scores(self):
+        if self._keyword_scores is None:
+            self._scan()
+        return self._keyword_scores
+
+    @property
+    def skipped(self):
+        if self._skipped is None:
+            self._scan()
+        return self._skipped
+
+    @property
+    def content_indexes(self):
+        skipped = self.skipped
+        return [i for i, sentence in enumerate(self.sentences) if len(sentence) >= 20 and not skipped[i]]
+
+    def fit(self, max_chars):
+        truncated = []
+        current_len = 0
+        for sentence in self.sentences:
+            if not sentence:
+                continue
+            if current_len + len(sentence) + 1 <= max_chars:
+                truncated.append(sentence)
+                current_len += len(sentence) + 1
+            else:
+                break
+        return ' '.join(truncated)
+
+def tfidf_matrix(lowered):
+    vocab = {}
+    rows = []
+    for sentence in lowered:
+        counts = {}
+        for word in _WORD.findall(sentence):
+            if word in STOPWORDS or len(word) < 2:
+                continue
+            index = vocab.setdefault(word, len(vocab))
+            counts[index] = counts.get(index, 0) + 1
+        rows.append(counts)
+
+    matrix = np.zeros((len(lowered), max(len(vocab), 1)), dtype=np.float32)
+    for i, counts in enumerate(rows):
+        if counts:
+            matrix[i, list(counts)] = list(counts.values())
+
+    df = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(lowered)) / (1 + df)) + 1
+    matrix = np.log1p(matrix) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def textrank(matrix, damping=TEXTRANK_DAMPING, iterations=TEXTRANK_ITERATIONS, tol=1e-6):
+    n = matrix.shape[0]
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0)
+    totals = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with the rest link uniformly so the walk stays stochastic.
+    transition = np.where(totals > 0, similarity / np.where(totals > 0, totals, 1), 1.0 / n)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+def rank_sentences(matrix, keyword_scores):
+    n = matrix.shape[0]
+    if n < 2:
+        return np.ones(n, dtype=np.float32)
+    scores = textrank(matrix)
+    # News articles front-load the facts, so nudge earlier sentences up.
+    lead = 1 + LEAD_BIAS / np.arange(1, n + 1)
+    return scores * lead * (1 + KEYWORD_WEIGHT * np.asarray(keyword_scores, dtype=np.float32))
+
+def summarize(text, max_chars=SUMMARY_MAX_CHARS):
+    model = text if isinstance(text, SentenceModel) else SentenceModel(text)
+    indexes = model.content_indexes
+    if not indexes:
+        return ""
+    sentences = [model.sentences[i] for i in indexes]
+    if sum(len(s) + 1 for s in sentences) - 1 <= max_chars:
+        return ' '.join(sentences)
+
+    matrix = tfidf_matrix([model.lowered[i] for i in indexes])
+    scores = rank_sentences(matrix, [model.keyword_scores[i] for i in indexes])
+    chosen = []
+    used = 0
+    for index in np.argsort(-scores, kind="stable"):
+        length = len(sentences[index]) + (1 if chosen else 0)
+        if used + length > max_chars:
+            continue
+        if chosen and (matrix[chosen] @ matrix[index]).max() > REDUNDANCY_THRESHOLD:
+            continue
+        chosen.append(int(index))
+        used += length
+    if not chosen:
+        return ""
+    return ' '.join(sentences[i] for i in sorted(chosen))
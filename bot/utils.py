@@ -1,13 +1,17 @@
 import re
 import os
-import requests
-from io import BytesIO
-from bs4 import BeautifulSoup
+import asyncio
+import hashlib
+from bs4 import BeautifulSoup, SoupStrainer
+from http_cache import cached_get
+from hf_client import summary_batcher
+from images import load_image, fallback_image
+from summarizer import summarize, SentenceModel, SUMMARY_MAX_CHARS, SUMMARIZER_VERSION
 
 CHANNEL_LINK = os.environ.get("TELEGRAM_CHANNEL_LINK", "https://t.me/DevModzBeta")
 CHANNEL_USERNAME = os.environ.get("TELEGRAM_CHANNEL_USERNAME", "@WhatsApp_Updates_X")
-
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+SUMMARY_USE_HF = os.environ.get("SUMMARY_USE_HF", "0") == "1"
+ARTICLE_MAX_BYTES = int(os.environ.get("ARTICLE_MAX_BYTES", str(1024 * 1024)))
 
 WHATSAPP_EMOJIS = {
     "Android": "🤖",
@@ -99,52 +103,118 @@ HASHTAGS = [
     "#Share",
 ]
 
+BRAND_LITERALS = {
+    "WABetaInfo": "WABeta News",
+    "wabetainfo": "WABeta News",
+    "WaBetaInfo": "WABeta News",
+    "WABETAINFO": "WABeta News",
+    "Twitter": "Telegram",
+    "twitter": "Telegram",
+}
+
+# Every alternative starts with a literal character so the regex engine can skip ahead
+# between candidates; case-insensitive matches are confirmed against word boundaries below.
+BRAND_PATTERN = re.compile(r"W(?i:abetainfo)|w(?i:abetainfo)|Twitter|twitter|O(?i:n x)|o(?i:n x)")
+BRAND_SEPARATOR = "\x00"
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+def _brand_replacement(match):
+    found = match.group()
+    replacement = BRAND_LITERALS.get(found)
+    if replacement is not None:
+        return replacement
+    text, start, end = match.string, match.start(), match.end()
+    if start > 0 and _is_word_char(text[start - 1]):
+        return found
+    if end < len(text) and _is_word_char(text[end]):
+        return found
+    return "on Telegram" if found[0] in "Oo" else "WABeta News"
+
 def clean_brand_text(text):
     if not text:
         return text
-    
-    replacements = [
-        ("WABetaInfo", "WABeta News"),
-        ("wabetainfo", "WABeta News"),
-        ("WaBetaInfo", "WABeta News"),
-        ("WABETAINFO", "WABeta News"),
-        ("WABetaInfo on X", "WABeta News on Telegram"),
-        ("wabetainfo on X", "WABeta News on Telegram"),
-        (" on X,", " on Telegram,"),
-        (" on X.", " on Telegram."),
-        (" on X ", " on Telegram "),
-        ("Twitter", "Telegram"),
-        ("twitter", "Telegram"),
-    ]
-    
-    result = text
-    for old, new in replacements:
-        result = result.replace(old, new)
-    
-    result = re.sub(r'\bWABetaInfo\b', 'WABeta News', result, flags=re.IGNORECASE)
-    result = re.sub(r'\bon X\b', 'on Telegram', result, flags=re.IGNORECASE)
-    
-    return result
+    return BRAND_PATTERN.sub(_brand_replacement, text)
+
+def clean_brand_texts(texts):
+    texts = list(texts)
+    present = [text for text in texts if text]
+    if not present or any(BRAND_SEPARATOR in text for text in present):
+        return [clean_brand_text(text) for text in texts]
+    cleaned = iter(BRAND_PATTERN.sub(_brand_replacement, BRAND_SEPARATOR.join(present)).split(BRAND_SEPARATOR))
+    return [next(cleaned) if text else text for text in texts]
+
+CONTENT_CONTAINERS = [
+    ('div', 'entry-content'),
+    ('article', None),
+    ('div', 'post-content'),
+    ('main', None),
+]
 
-def fetch_full_article_content(url):
-    headers = {"User-Agent": USER_AGENT}
-    try:
-        response = requests.get(url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            article_content = soup.find('div', class_='entry-content')
-            if not article_content or not hasattr(article_content, 'find_all'):
-                article_content = soup.find('article')
-            if not article_content or not hasattr(article_content, 'find_all'):
-                article_content = soup.find('div', class_='post-content')
-            if not article_content or not hasattr(article_content, 'find_all'):
-                article_content = soup.find('main')
-            
-            if article_content and hasattr(article_content, 'find_all'):
+def _container_strainer(containers):
+    def wanted(name, attrs):
+        if name == 'meta':
+            return True
+        for tag, class_ in containers:
+            if name != tag:
+                continue
+            if not class_:
+                return True
+            classes = attrs.get('class') or ''
+            if isinstance(classes, str):
+                classes = classes.split()
+            if class_ in classes:
+                return True
+        return False
+    return SoupStrainer(wanted)
+
+_content_strainer = _container_strainer(CONTENT_CONTAINERS)
+
+class ArticleDocument:
+    def __init__(self, url, html):
+        self.url = url
+        self.soup = BeautifulSoup(html, 'lxml', parse_only=_content_strainer) if html else None
+        self._containers = {}
+        self._paragraph_text = None
+        self._full_text = None
+        self._lead_image = False
+        self._og_image = False
+
+    def content(self, depth):
+        if depth in self._containers:
+            return self._containers[depth]
+        article_content = None
+        if self.soup is not None:
+            for name, class_ in CONTENT_CONTAINERS[:depth]:
+                if class_:
+                    article_content = self.soup.find(name, class_=class_)
+                else:
+                    article_content = self.soup.find(name)
+                if article_content and hasattr(article_content, 'find_all'):
+                    break
+                article_content = None
+        self._containers[depth] = article_content
+        return article_content
+
+    @property
+    def paragraph_text(self):
+        if self._paragraph_text is None:
+            text = ""
+            article_content = self.content(3)
+            if article_content:
+                paragraphs = article_content.find_all('p')
+                text = ' '.join([p.get_text().strip() for p in paragraphs if hasattr(p, 'get_text') and p.get_text().strip()])
+            self._paragraph_text = clean_brand_text(text)
+        return self._paragraph_text
+
+    @property
+    def full_text(self):
+        if self._full_text is None:
+            full_text_parts = []
+            article_content = self.content(4)
+            if article_content:
                 paragraphs = article_content.find_all(['p', 'h2', 'h3', 'h4', 'li', 'blockquote'])
-                
-                full_text_parts = []
                 for elem in paragraphs:
                     if hasattr(elem, 'get_text'):
                         text = elem.get_text().strip()
@@ -157,14 +227,67 @@ def fetch_full_article_content(url):
                                 full_text_parts.append(f"• {text}")
                             else:
                                 full_text_parts.append(text)
-                
-                full_text = '\n\n'.join(full_text_parts)
-                return clean_brand_text(full_text)
+            self._full_text = clean_brand_text('\n\n'.join(full_text_parts))
+        return self._full_text
+
+    @property
+    def lead_image(self):
+        if self._lead_image is False:
+            self._lead_image = None
+            article_content = self.content(2)
+            if article_content:
+                for img in article_content.find_all('img'):
+                    if hasattr(img, 'get'):
+                        src = img.get('src', '') or img.get('data-src', '')
+                        if src and isinstance(src, str) and 'wabetainfo.com' in src:
+                            if 'wp-content/uploads' in src and 'logo' not in src.lower():
+                                self._lead_image = src
+                                break
+        return self._lead_image
+
+    @property
+    def og_image(self):
+        if self._og_image is False:
+            self._og_image = None
+            if self.soup is not None:
+                og_image = self.soup.find('meta', attrs={'property': 'og:image'})
+                if og_image and hasattr(og_image, 'get'):
+                    img_url = og_image.get('content', '')
+                    if img_url and isinstance(img_url, str) and 'logo' not in img_url.lower():
+                        self._og_image = img_url
+        return self._og_image
+
+_article_documents = {}
+
+def clear_article_cache():
+    _article_documents.clear()
+
+async def get_article_document(url):
+    doc = _article_documents.get(url)
+    if doc is not None:
+        return doc
+    
+    html = None
+    try:
+        response = await cached_get(url, kind="page", timeout=20, max_bytes=ARTICLE_MAX_BYTES)
+        if response.status_code == 200:
+            html = response.content
+    except Exception as e:
+        print(f"Error fetching article: {e}")
+    
+    doc = await asyncio.to_thread(ArticleDocument, url, html)
+    _article_documents[url] = doc
+    return doc
+
+async def fetch_full_article_content(url):
+    try:
+        doc = await get_article_document(url)
+        return doc.full_text
     except Exception as e:
         print(f"Error fetching full article: {e}")
     return ""
 
-def format_full_article_with_emojis(title, article_text, link, categories, main_cat, max_chars=1024):
+def caption_frame(title, categories, main_cat):
     emoji, _ = get_category_emoji(categories)
     
     extra_hashtags = []
@@ -198,25 +321,20 @@ def format_full_article_with_emojis(title, article_text, link, categories, main_
 
 📢 Join Our Channel:
 {CHANNEL_USERNAME}"""
+    return header, footer
 
+def caption_budget(title, categories, main_cat, max_chars=1024):
+    header, footer = caption_frame(title, categories, main_cat)
+    return max_chars - len(header) - len(footer)
+
+def format_full_article_with_emojis(title, article_text, link, categories, main_cat, max_chars=1024):
+    header, footer = caption_frame(title, categories, main_cat)
     available_chars = max_chars - len(header) - len(footer)
     
     summary_text = article_text if article_text else ""
     
     if len(summary_text) > available_chars:
-        sentences = re.split(r'(?<=[.!?])\s+', summary_text.strip())
-        truncated = []
-        current_len = 0
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-            if current_len + len(sentence) + 1 <= available_chars:
-                truncated.append(sentence)
-                current_len += len(sentence) + 1
-            else:
-                break
-        summary_text = ' '.join(truncated)
+        summary_text = SentenceModel(summary_text).fit(available_chars)
         if not summary_text.endswith('.') and not summary_text.endswith('!') and not summary_text.endswith('?'):
             summary_text = summary_text.rstrip() + '.'
     
@@ -224,158 +342,76 @@ def format_full_article_with_emojis(title, article_text, link, categories, main_
 
     return full_article
 
-def fetch_article_content(url):
-    headers = {"User-Agent": USER_AGENT}
+async def fetch_article_content(url):
     try:
-        response = requests.get(url, headers=headers, timeout=20)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            article_content = soup.find('div', class_='entry-content')
-            if not article_content or not hasattr(article_content, 'find_all'):
-                article_content = soup.find('article')
-            if not article_content or not hasattr(article_content, 'find_all'):
-                article_content = soup.find('div', class_='post-content')
-            
-            if article_content and hasattr(article_content, 'find_all'):
-                paragraphs = article_content.find_all('p')
-                text = ' '.join([p.get_text().strip() for p in paragraphs if hasattr(p, 'get_text') and p.get_text().strip()])
-                return clean_brand_text(text)
+        doc = await get_article_document(url)
+        return doc.paragraph_text
     except Exception as e:
         print(f"Error fetching article: {e}")
     return ""
 
-def get_article_image(url):
-    headers = {"User-Agent": USER_AGENT}
+async def get_article_image(url):
     try:
-        response = requests.get(url, headers=headers, timeout=20)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            article_content = soup.find('div', class_='entry-content')
-            if not article_content or not hasattr(article_content, 'find_all'):
-                article_content = soup.find('article')
-            
-            if article_content and hasattr(article_content, 'find_all'):
-                images = article_content.find_all('img')
-                for img in images:
-                    if hasattr(img, 'get'):
-                        src = img.get('src', '') or img.get('data-src', '')
-                        if src and isinstance(src, str) and 'wabetainfo.com' in src:
-                            if 'wp-content/uploads' in src and 'logo' not in src.lower():
-                                print(f"Found article image: {src}")
-                                return src
-            
-            og_image = soup.find('meta', attrs={'property': 'og:image'})
-            if og_image and hasattr(og_image, 'get'):
-                img_url = og_image.get('content', '')
-                if img_url and isinstance(img_url, str) and 'logo' not in img_url.lower():
-                    print(f"Found og:image: {img_url}")
-                    return img_url
+        doc = await get_article_document(url)
+        if doc.lead_image:
+            print(f"Found article image: {doc.lead_image}")
+            return doc.lead_image
+        if doc.og_image:
+            print(f"Found og:image: {doc.og_image}")
+            return doc.og_image
     except Exception as e:
         print(f"Error getting article image: {e}")
     return None
 
-def summarize_with_huggingface(text, max_length=1500, min_length=500):
+async def summarize_with_huggingface(text, max_length=1500, min_length=500, deadline=None):
     if not text or len(text) < 200:
         return text
-    
-    try:
-        api_url = "https://router.huggingface.co/hf-inference/models/facebook/bart-large-cnn"
-        
-        hf_token = os.environ.get("HUGGINGFACE_TOKEN", "")
-        headers = {"Content-Type": "application/json"}
-        if hf_token:
-            headers["Authorization"] = f"Bearer {hf_token}"
-        
-        input_text = text[:4000]
-        
-        payload = {
-            "inputs": input_text,
-            "parameters": {
-                "max_length": max_length,
-                "min_length": min_length,
-                "do_sample": False
-            },
-            "options": {
-                "wait_for_model": True
-            }
-        }
-        
-        response = requests.post(api_url, headers=headers, json=payload, timeout=120)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                summary = result[0].get('summary_text', '')
-                if summary:
-                    print(f"HuggingFace summarization successful: {len(summary)} chars")
-                    return summary
-        elif response.status_code == 503:
-            print("HuggingFace model loading, using fallback...")
-        else:
-            print(f"HuggingFace API error: {response.status_code} - {response.text[:100]}")
-    except Exception as e:
-        print(f"HuggingFace summarization failed: {e}")
-    
-    return None
+    return await summary_batcher.summarize(text, max_length=max_length, min_length=min_length, deadline=deadline)
 
-def extract_key_sentences(text, max_sentences=8):
-    if not text:
-        return []
-    
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    
-    key_sentences = []
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if len(sentence) < 20:
-            continue
-        if any(skip in sentence.lower() for skip in ['click here', 'subscribe', 'follow us', 'read more', 'advertisement']):
-            continue
-        
-        importance = 0
-        important_words = ['new', 'update', 'feature', 'fix', 'bug', 'add', 'remove', 'change', 'improve', 'support', 'enable', 'disable', 'option', 'setting', 'version', 'beta', 'stable', 'release', 'whatsapp', 'android', 'ios', 'now', 'can', 'will', 'allow', 'introduce']
-        for word in important_words:
-            if word in sentence.lower():
-                importance += 1
-        
-        if importance > 0 or len(key_sentences) < 3:
-            key_sentences.append((importance, sentence))
-    
-    key_sentences.sort(key=lambda x: x[0], reverse=True)
-    
-    result = [s[1] for s in key_sentences[:max_sentences]]
-    return result
+SUMMARY_MODE = "hf" if SUMMARY_USE_HF else "local"
+
+def summary_key(text, max_chars):
+    normalized = " ".join(text.split())
+    mode = SUMMARY_MODE
+    return hashlib.sha256(f"{SUMMARIZER_VERSION}:{mode}:{max_chars}:{normalized}".encode()).hexdigest()
 
-def summarize_text(text, target_words=2500):
+def caption_key(title, link, categories):
+    return hashlib.sha256("\x1f".join([title, link, *categories]).encode()).hexdigest()
+
+# Returns (summary, mode); mode is "hf" only when the summary actually came from Hugging Face.
+async def summarize_text(text, target_words=2500, max_chars=SUMMARY_MAX_CHARS, deadline=None):
     if not text or len(text) < 100:
-        return clean_brand_text(text) if text else text
+        return (clean_brand_text(text) if text else text), "local"
     
-    hf_summary = summarize_with_huggingface(text)
-    if hf_summary and len(hf_summary) > 200:
-        return clean_brand_text(hf_summary)
+    model = SentenceModel(text)
+    if SUMMARY_USE_HF:
+        draft = await asyncio.to_thread(summarize, model, max_chars * 3)
+        hf_summary = await summarize_with_huggingface(
+            draft, max_length=max_chars // 3, min_length=max_chars // 8, deadline=deadline
+        )
+        if hf_summary and len(hf_summary) > 200:
+            return clean_brand_text(hf_summary), "hf"
     
-    key_sentences = extract_key_sentences(text, max_sentences=8)
-    if key_sentences:
-        return clean_brand_text(' '.join(key_sentences))
+    summary = await asyncio.to_thread(summarize, model, max_chars)
+    if summary:
+        return clean_brand_text(summary), "local"
     
     words = text.split()
     if len(words) > target_words:
         summary = ' '.join(words[:target_words])
+        sentences = SentenceModel(summary).sentences
     else:
         summary = text
-    
-    sentences = re.split(r'(?<=[.!?])\s+', summary)
+        sentences = model.sentences
     if sentences:
         summary = ' '.join(sentences[:-1]) if len(sentences) > 1 else summary
     
-    return clean_brand_text(summary)
+    return clean_brand_text(summary), "local"
 
-def get_image(entry):
+async def get_image(entry):
     link = getattr(entry, "link", "")
     if link:
-        article_img = get_article_image(link)
+        article_img = await get_article_image(link)
         if article_img:
             return article_img
     
@@ -408,49 +444,17 @@ def get_image(entry):
     
     return None
 
-def download_image(entry):
-    url = get_image(entry)
+async def download_image(entry):
+    url = await get_image(entry)
     
     if not url:
         print("No image URL found, using fallback")
-        url = "https://upload.wikimedia.org/wikipedia/commons/thumb/6/6b/WhatsApp.svg/512px-WhatsApp.svg.png"
-    
-    print(f"Attempting to download image from: {url}")
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "image/webp,image/apng,image/*,*/*;q=0.8",
-        "Referer": "https://wabetainfo.com/"
-    }
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=20, allow_redirects=True)
-        content_type = response.headers.get('content-type', '')
-        print(f"Response status: {response.status_code}, Content-Type: {content_type}, Size: {len(response.content)}")
-        
-        if response.status_code == 200 and 'image' in content_type:
-            img_data = BytesIO(response.content)
-            img_data.name = 'image.jpg'
-            return img_data
-    except Exception as e:
-        print(f"Error downloading image: {e}")
+        return await fallback_image()
     
-    fallback_urls = [
-        "https://upload.wikimedia.org/wikipedia/commons/thumb/6/6b/WhatsApp.svg/512px-WhatsApp.svg.png",
-    ]
-    
-    for fallback_url in fallback_urls:
-        try:
-            print(f"Trying fallback: {fallback_url}")
-            response = requests.get(fallback_url, headers=headers, timeout=15)
-            content_type = response.headers.get('content-type', '')
-            if response.status_code == 200 and 'image' in content_type:
-                img_data = BytesIO(response.content)
-                img_data.name = 'image.png'
-                return img_data
-        except Exception as e:
-            print(f"Error downloading fallback: {e}")
-    
-    return None
+    img_data = await load_image(url)
+    if img_data is not None:
+        return img_data
+    return await fallback_image()
 
 def get_description(entry):
     if hasattr(entry, "summary"):
@@ -501,29 +505,6 @@ def build_caption(entry):
     
     return caption, categories
 
-def build_full_article(entry):
-    title = clean_brand_text(getattr(entry, "title", "WhatsApp Update"))
-    link = getattr(entry, "link", "")
-    
-    categories = []
-    if hasattr(entry, "tags"):
-        categories = [tag.term for tag in entry.tags if hasattr(tag, 'term')]
-    
-    emoji, main_cat = get_category_emoji(categories)
-    
-    article_content = ""
-    if link:
-        article_content = fetch_article_content(link)
-    
-    if article_content:
-        summary = summarize_text(article_content)
-    else:
-        summary = get_description(entry)
-    
-    full_article = format_full_article_with_emojis(title, summary, link, categories, main_cat)
-    
-    return full_article, categories
-
 def split_message(text, max_length=4096):
     if len(text) <= max_length:
         return [text]